@@ -34,3 +34,8 @@ def internettime(dt):
 
 def now():
     return internettime(datetime.now())
+
+def remaining(dt):
+    seconds = dt.second + (dt.microsecond / 1000000.0) + (dt.minute * 60) + ((dt.hour + 1) * 3600)
+
+    return 86.4 - (seconds % 86.4)
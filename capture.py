@@ -0,0 +1,93 @@
+"""
+    project............: Handgurke
+    description........: ICB client
+    date...............: 06/2019
+    copyright..........: Sebastian Fedrau
+
+    Permission is hereby granted, free of charge, to any person obtaining
+    a copy of this software and associated documentation files (the
+    "Software"), to deal in the Software without restriction, including
+    without limitation the rights to use, copy, modify, merge, publish,
+    distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to
+    the following conditions:
+
+    The above copyright notice and this permission notice shall be
+    included in all copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+    IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+    OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+    ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+    OTHER DEALINGS IN THE SOFTWARE.
+"""
+import struct
+import time
+
+MAGIC = b"HGCAP\x01"
+
+INBOUND = 0
+OUTBOUND = 1
+
+HEADER = struct.Struct("<BII")
+
+class Writer:
+    def __init__(self, path):
+        self.__f = open(path, "wb")
+        self.__f.write(MAGIC)
+        self.__last = time.monotonic()
+
+    def write(self, direction, data):
+        now = time.monotonic()
+        delta = min(int((now - self.__last) * 1000000), 0xffffffff)
+
+        self.__last = now
+
+        self.__f.write(HEADER.pack(direction, delta, len(data)))
+        self.__f.write(data)
+
+    def close(self):
+        self.__f.close()
+
+def read(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s is not a capture file" % path)
+
+        while True:
+            header = f.read(HEADER.size)
+
+            if len(header) < HEADER.size:
+                break
+
+            direction, delta, length = HEADER.unpack(header)
+
+            data = f.read(length)
+
+            if len(data) < length:
+                break
+
+            yield direction, delta / 1000000.0, data
+
+class ReplayTransport:
+    def __init__(self):
+        self.__protocol = None
+        self.__closing = False
+        self.written = 0
+
+    def attach(self, protocol):
+        self.__protocol = protocol
+
+    def write(self, data):
+        self.written += len(data)
+
+    def is_closing(self):
+        return self.__closing
+
+    def close(self):
+        if not self.__closing:
+            self.__closing = True
+
+            self.__protocol.connection_lost(None)
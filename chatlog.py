@@ -0,0 +1,92 @@
+"""
+    project............: Handgurke
+    description........: ICB client
+    date...............: 06/2019
+    copyright..........: Sebastian Fedrau
+
+    Permission is hereby granted, free of charge, to any person obtaining
+    a copy of this software and associated documentation files (the
+    "Software"), to deal in the Software without restriction, including
+    without limitation the rights to use, copy, modify, merge, publish,
+    distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to
+    the following conditions:
+
+    The above copyright notice and this permission notice shall be
+    included in all copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+    IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+    OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+    ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+    OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+def format_message(timestamp, message_type, fields):
+    time = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+
+    if message_type == "b":
+        text = "<%s> %s" % (fields[0], fields[1])
+    elif message_type == "c":
+        text = "*%s* %s" % (fields[0], fields[1])
+    elif message_type in "df":
+        text = "[%s] %s" % (fields[0], fields[1])
+    elif message_type == "e":
+        text = "*ERR* %s" % fields[0]
+    elif message_type == "k":
+        text = "*BEEP* %s beeps you." % fields[0]
+    elif message_type == "i" and fields[0] == "co":
+        text = fields[1]
+    else:
+        text = " ".join(fields)
+
+    return "%s %s\n" % (time, text)
+
+def write_messages(filename, messages):
+    with open(filename, "a", encoding="UTF-8") as f:
+        f.writelines(format_message(*m) for m in messages)
+
+class Log:
+    def __init__(self, filename, pool, report=None):
+        self.__filename = filename
+        self.__pool = pool
+        self.__report = report
+        self.__failed = False
+        self.__pending = []
+        self.__writing = False
+
+    def append(self, timestamp, message_type, fields):
+        self.__pending.append((timestamp, message_type, fields))
+
+        if not self.__writing:
+            self.__write__()
+
+    def __write__(self):
+        messages = self.__pending
+        self.__pending = []
+        self.__writing = True
+
+        self.__pool.submit_serial(write_messages, self.__filename, messages).add_done_callback(self.__written__)
+
+    def __written__(self, f):
+        self.__writing = False
+
+        error = f.exception() if not f.cancelled() else None
+
+        # reported once until a write succeeds again
+        if error and not self.__failed and self.__report:
+            self.__report("Couldn't write log: %s" % error)
+
+        self.__failed = error is not None
+
+        if self.__pending:
+            self.__write__()
+
+    def close(self):
+        # queued behind a running write, the pool waits for the serial queue on shutdown
+        if self.__pending:
+            self.__pool.submit_serial(write_messages, self.__filename, self.__pending)
+
+            self.__pending = []
@@ -24,23 +24,165 @@
     OTHER DEALINGS IN THE SOFTWARE.
 """
 import asyncio
+from collections import deque
 import ssl
 import ltd
+import stats
+import timer
+import profiling
+import scheduler
+import capture
+
+COMMANDS = ["beep", "boot", "cancel", "drop", "echoback", "exclude", "g", "hush", "invite", "m", "motd",
+            "name", "news", "nick", "nobeep", "notify", "pass", "ping", "status", "talk", "topic", "v", "w", "whereis"]
+
+# inbound lanes, served in this order
+PING = 0
+URGENT = 1
+STATUS = 2
+OPEN = 3
+
+# status messages changing the group or a nick are kept in order with open messages
+CONTEXT_CHANGES = (b"Status\x01You are now in group", b"Name\x01")
+
+def packet_lane(msg):
+    lane = OPEN
+
+    if msg:
+        t, p = msg
+
+        if t in "lm":
+            lane = PING
+        elif t in "cefk":
+            lane = URGENT
+        elif t == "d" and p.startswith(CONTEXT_CHANGES):
+            lane = OPEN
+        elif t in "di":
+            lane = STATUS
+
+    return lane
+
+class Inbox:
+    UrgentWait = stats.registry.histogram("handgurke_urgent_wait_seconds", "Time personal messages, beeps and errors waited to be processed.")
+
+    def __init__(self, classify=packet_lane):
+        self.__classify = classify
+        self.__lanes = [deque() for _ in range(OPEN + 1)]
+        self.__barriers = 0
+        self.__size = 0
+        self.__waiter = None
+
+    def qsize(self):
+        return self.__size
+
+    def put_nowait(self, msg):
+        lane = self.__classify(msg)
+        barrier = lane == OPEN and msg is not None and msg[0] == "d"
+
+        if barrier:
+            self.__barriers += 1
+        elif self.__barriers and msg is not None and (lane == STATUS or msg[0] == "f"):
+            # routed by the current group, must not overtake a pending group change
+            lane = OPEN
+
+        self.__lanes[lane].append((msg, barrier, timer.Timer() if lane == URGENT else None))
+        self.__size += 1
+
+        if self.__waiter and not self.__waiter.done():
+            self.__waiter.set_result(None)
+
+    def get_nowait(self):
+        for lane in self.__lanes:
+            if lane:
+                msg, barrier, waiting = lane.popleft()
+
+                self.__size -= 1
+
+                if barrier:
+                    self.__barriers -= 1
+
+                if waiting:
+                    self.UrgentWait.observe(waiting.elapsed())
+
+                return msg
+
+        raise asyncio.QueueEmpty()
+
+    async def get(self):
+        while not self.__size:
+            self.__waiter = asyncio.get_event_loop().create_future()
+
+            await self.__waiter
+
+        return self.get_nowait()
 
 class ICBClientProtocol(asyncio.Protocol):
-    def __init__(self, on_conn_lost, queue):
+    BytesReceived = stats.registry.counter("handgurke_bytes_received_total", "Bytes received by LTD type.", "type")
+    PacketsReceived = stats.registry.counter("handgurke_packets_received_total", "Packets received by LTD type.", "type")
+    DecodeTime = stats.registry.histogram("handgurke_decode_seconds", "Time spent splitting received data into packets.")
+    WritePauses = stats.registry.counter("handgurke_write_pauses_total", "Number of times the transport buffer was full.")
+    Profile = profiling.section("decoder")
+
+    def __init__(self, on_conn_lost, queue, scheduler, timeout, capture_writer=None):
         self.__on_conn_lost = on_conn_lost
+        self.__scheduler = scheduler
+        self.__timeout = timeout
+        self.__watchdog = None
+        self.__capture = capture_writer
         self.__transport = None
         self.__decoder = ltd.Decoder()
         self.__decoder.add_listener(self.__message_received__)
         self.__queue = queue
+        self.__paused = False
+        self.__drain_waiters = deque()
+        self.__closed = False
 
     def connection_made(self, transport):
         self.__transport = transport
 
+        # armed only when connected, a pending connection attempt has its own timeout
+        if self.__timeout:
+            self.__watchdog = self.__scheduler.call_later(self.__timeout, self.__timeout__)
+
+    def pause_writing(self):
+        self.WritePauses.inc()
+
+        self.__paused = True
+
+    def resume_writing(self):
+        self.__paused = False
+
+        while self.__drain_waiters:
+            waiter = self.__drain_waiters.popleft()
+
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def drain(self):
+        if self.__closed:
+            raise ConnectionResetError("Connection lost")
+
+        if self.__paused:
+            waiter = asyncio.get_event_loop().create_future()
+
+            self.__drain_waiters.append(waiter)
+
+            await waiter
+
     def data_received(self, data):
+        if self.__watchdog:
+            self.__watchdog.reset(self.__timeout)
+
+        if self.__capture:
+            self.__capture.write(capture.INBOUND, data)
+
         try:
-            self.__decoder.write(data)
+            t = timer.Timer()
+
+            with self.Profile:
+                self.__decoder.write(data)
+
+            self.DecodeTime.observe(t.elapsed())
 
         except Exception as ex:
             self.__shutdown__(ex)
@@ -48,22 +190,97 @@ class ICBClientProtocol(asyncio.Protocol):
     def connection_lost(self, ex):
         self.__shutdown__(ex)
 
+    def __timeout__(self):
+        self.__queue.put_nowait(None)
+        self.__transport.close()
+
     def __shutdown__(self, ex=None):
-        self.__on_conn_lost.set_result(ex if ex else 0)
+        if self.__watchdog:
+            self.__watchdog.cancel()
+
+        self.__closed = True
+
+        while self.__drain_waiters:
+            waiter = self.__drain_waiters.popleft()
+
+            if not waiter.done():
+                waiter.set_exception(ConnectionResetError("Connection lost"))
+
+        if not self.__on_conn_lost.done():
+            self.__on_conn_lost.set_result(ex if ex else 0)
 
     def __message_received__(self, type_id, payload):
+        self.BytesReceived.inc(len(payload) + 2, type_id)
+        self.PacketsReceived.inc(1, type_id)
+
         self.__queue.put_nowait((type_id, payload))
 
+        Client.QueueDepth.set(self.__queue.qsize())
+
+class Keepalive:
+    RoundTripTime = stats.registry.histogram("handgurke_rtt_seconds", "Round-trip time of client pings.")
+    SmoothedRoundTripTime = stats.registry.gauge("handgurke_srtt_seconds", "Smoothed round-trip time of client pings.")
+    Jitter = stats.registry.gauge("handgurke_rtt_jitter_seconds", "Mean deviation of the round-trip time.")
+
+    def __init__(self):
+        self.__pending = deque()
+        self.__srtt = None
+        self.__jitter = None
+
+    @property
+    def missed(self):
+        return len(self.__pending)
+
+    @property
+    def rtt(self):
+        return self.__srtt
+
+    @property
+    def jitter(self):
+        return self.__jitter
+
+    def sent(self):
+        self.__pending.append(timer.Timer())
+
+    def received(self):
+        if self.__pending:
+            rtt = self.__pending.popleft().elapsed()
+
+            # smoothing as in RFC 6298
+            if self.__srtt is None:
+                self.__srtt = rtt
+                self.__jitter = rtt / 2.0
+            else:
+                self.__jitter = 0.75 * self.__jitter + 0.25 * abs(self.__srtt - rtt)
+                self.__srtt = 0.875 * self.__srtt + 0.125 * rtt
+
+            self.RoundTripTime.observe(rtt)
+            self.SmoothedRoundTripTime.set(self.__srtt)
+            self.Jitter.set(self.__jitter)
+
 class Client:
     Timeout = 90.0
 
-    def __init__(self, host, port, use_ssl=False, verify_cert=False):
+    BytesSent = stats.registry.counter("handgurke_bytes_sent_total", "Bytes sent by LTD type.", "type")
+    PacketsSent = stats.registry.counter("handgurke_packets_sent_total", "Packets sent by LTD type.", "type")
+    QueueDepth = stats.registry.gauge("handgurke_inbound_queue_depth", "Number of received packets waiting to be processed.")
+    FieldDecodeTime = stats.registry.histogram("handgurke_field_decode_seconds", "Time spent decoding the fields of a packet.")
+    Reconnects = stats.registry.counter("handgurke_reconnects_total", "Number of connection attempts after the first one.")
+    DeadPeers = stats.registry.counter("handgurke_dead_peers_total", "Number of connections closed because of missing pongs.")
+
+    def __init__(self, host, port, use_ssl=False, verify_cert=False, max_missed_pongs=3, scheduler=None, filters=None, capture_writer=None):
         self.__host = host
         self.__port = port
-        self.__queue = asyncio.Queue()
+        self.__scheduler = scheduler
+        self.__filters = filters
+        self.__capture = capture_writer
+        self.__max_missed_pongs = max_missed_pongs
+        self.__keepalive = Keepalive()
+        self.__queue = Inbox()
         self.__transport = None
         self.__protocol = None
         self.__sc = None
+        self.__attempts = 0
 
         if use_ssl:
             self.__sc = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
@@ -75,15 +292,42 @@ class Client:
     async def connect(self):
         loop = asyncio.get_event_loop()
 
-        on_conn_lost = loop.create_future()
+        if self.__attempts:
+            self.Reconnects.inc()
+
+        self.__attempts += 1
 
-        self.__transport, self.__protocol = await loop.create_connection(lambda: ICBClientProtocol(on_conn_lost, self.__queue),
-                                                                         self.__host,
-                                                                         self.__port,
-                                                                         ssl=self.__sc)
+        on_conn_lost = self.__prepare__(loop)
+
+        try:
+            self.__transport, self.__protocol = await asyncio.wait_for(loop.create_connection(lambda: ICBClientProtocol(on_conn_lost, self.__queue, self.__scheduler, self.Timeout, self.__capture),
+                                                                                              self.__host,
+                                                                                              self.__port,
+                                                                                              ssl=self.__sc),
+                                                                       self.Timeout)
+        except asyncio.TimeoutError:
+            raise ConnectionError("Connection attempt timed out.")
 
         return on_conn_lost
 
+    def attach(self, transport, timeout=Timeout):
+        on_conn_lost = self.__prepare__(asyncio.get_event_loop())
+
+        self.__protocol = ICBClientProtocol(on_conn_lost, self.__queue, self.__scheduler, timeout)
+        self.__transport = transport
+
+        self.__protocol.connection_made(transport)
+
+        return self.__protocol, on_conn_lost
+
+    def __prepare__(self, loop):
+        self.__keepalive = Keepalive()
+
+        if not self.__scheduler:
+            self.__scheduler = scheduler.Scheduler(loop)
+
+        return loop.create_future()
+
     def login(self, loginid, nick, group="", password=""):
         e = ltd.Encoder("a")
 
@@ -93,10 +337,21 @@ class Client:
         e.add_field_str("login")
         e.add_field_str(password)
 
-        self.__transport.write(e.encode())
+        self.__write__(e.encode())
 
     def open_message(self, text):
-        self.__transport.write(ltd.encode_str("b", text.strip()))
+        self.__write__(ltd.encode_str("b", text.strip()))
+
+    def private_message(self, nick, text):
+        self.command("m", "%s %s" % (nick, text.strip()))
+
+    @staticmethod
+    def message_limit(nick=None):
+        # payload of a packet is limited to 254 bytes
+        if nick:
+            return 251 - len(nick.encode("UTF-8"))
+
+        return 253
 
     def command(self, command, arg=""):
         e = ltd.Encoder("h")
@@ -104,24 +359,103 @@ class Client:
         e.add_field_str(command)
         e.add_field_str(arg if not arg is None else "")
 
-        self.__transport.write(e.encode())
+        self.__write__(e.encode())
 
     def ping(self):
-        self.__transport.write(ltd.encode_empty_cmd("l"))
+        self.__write__(ltd.encode_empty_cmd("l"))
+
+    @property
+    def pending(self):
+        return self.__queue.qsize()
+
+    @property
+    def connected(self):
+        return self.__transport is not None and not self.__transport.is_closing()
+
+    @property
+    def rtt(self):
+        return self.__keepalive.rtt
+
+    @property
+    def jitter(self):
+        return self.__keepalive.jitter
+
+    def keepalive(self):
+        alive = True
+
+        if self.connected:
+            if self.__keepalive.missed >= self.__max_missed_pongs:
+                self.DeadPeers.inc()
+                self.__transport.close()
+
+                alive = False
+            else:
+                self.ping()
+                self.__keepalive.sent()
+
+        return alive
 
     def pong(self):
-        self.__transport.write(ltd.encode_empty_cmd("m"))
+        self.__write__(ltd.encode_empty_cmd("m"))
 
     async def read(self):
-        try:
-            t, p = await asyncio.wait_for(self.__queue.get(), timeout=self.Timeout)
+        msg = await self.__queue.get()
+
+        while self.__ignored__(msg):
+            msg = await self.__queue.get()
+
+        return self.__decode__(msg)
+
+    def read_nowait(self):
+        msg = self.__queue.get_nowait()
+
+        while self.__ignored__(msg):
+            msg = self.__queue.get_nowait()
+
+        return self.__decode__(msg)
+
+    def __ignored__(self, msg):
+        ignored = False
+
+        if msg and self.__filters and msg[0] in "bck":
+            ignored = self.__filters.ignored(ltd.first_field(msg[1]).decode("UTF-8").rstrip(" \0"))
+
+        return ignored
+
+    def __decode__(self, msg):
+        self.QueueDepth.set(self.__queue.qsize())
+
+        if msg:
+            t, p = msg
 
             if t == "g":
                 self.__transport.close()
+            elif t == "m":
+                self.__keepalive.received()
 
-            return t, [f.decode("UTF-8").rstrip(" \0") for f in ltd.split(p)]
-        except asyncio.TimeoutError:
-            self.__transport.close()
+            elapsed = timer.Timer()
+
+            with ICBClientProtocol.Profile:
+                fields = [f.decode("UTF-8").rstrip(" \0") for f in ltd.split(p)]
+
+            self.FieldDecodeTime.observe(elapsed.elapsed())
+
+            return t, fields
+
+    def write(self, pkg):
+        self.__write__(pkg)
+
+    def __write__(self, pkg):
+        self.BytesSent.inc(len(pkg), chr(pkg[1]))
+        self.PacketsSent.inc(1, chr(pkg[1]))
+
+        if self.__capture:
+            self.__capture.write(capture.OUTBOUND, pkg)
+
+        self.__transport.write(pkg)
+
+    async def drain(self):
+        await self.__protocol.drain()
 
     def quit(self):
         self.__transport.close()
@@ -0,0 +1,123 @@
+"""
+    project............: Handgurke
+    description........: ICB client
+    date...............: 06/2019
+    copyright..........: Sebastian Fedrau
+
+    Permission is hereby granted, free of charge, to any person obtaining
+    a copy of this software and associated documentation files (the
+    "Software"), to deal in the Software without restriction, including
+    without limitation the rights to use, copy, modify, merge, publish,
+    distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to
+    the following conditions:
+
+    The above copyright notice and this permission notice shall be
+    included in all copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+    IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+    OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+    ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+    OTHER DEALINGS IN THE SOFTWARE.
+"""
+import stats
+
+JOINED = ["Sign-on", "Arrive"]
+LEFT = ["Sign-off", "Depart"]
+
+class Summary:
+    __slots__ = ["id", "buffer", "index", "started", "last", "joined", "left", "events", "dropped"]
+
+    def __init__(self, summary_id, buffer, index, started):
+        self.id = summary_id
+        self.buffer = buffer
+        self.index = index
+        self.started = started
+        self.last = started
+        self.joined = [0, []]
+        self.left = [0, []]
+        self.events = []
+        self.dropped = 0
+
+class Collapser:
+    Events = stats.registry.counter("handgurke_collapsed_events_total", "Number of status messages collapsed into summary lines.")
+    Summaries = stats.registry.counter("handgurke_summaries_total", "Number of summary lines.")
+
+    MaxNames = 3
+    MaxDetails = 200
+
+    def __init__(self, model, period=300.0, rules=None):
+        self.__model = model
+        self.__period = period
+        self.__rules = rules
+        self.__current = {}
+        self.__summaries = {}
+        self.__next_id = 1
+
+    def add(self, timestamp, message_type, fields, buffer):
+        if message_type != "d" or not fields[0] in JOINED + LEFT:
+            return False
+
+        if self.__rules and fields[0].lower() in self.__rules.hidden:
+            return False
+
+        summary = self.__current.get(buffer)
+
+        if summary is None or (timestamp - summary.started).total_seconds() >= self.__period:
+            summary = Summary(self.__next_id, buffer, len(buffer.messages), timestamp)
+
+            if not self.__model.append_message(timestamp, "d", ["Activity", ""], buffer):
+                return False
+
+            self.__next_id += 1
+            self.__current[buffer] = summary
+            self.__summaries[summary.id] = summary
+
+            self.Summaries.inc()
+
+        names = summary.joined if fields[0] in JOINED else summary.left
+
+        names[0] += 1
+
+        if len(names[1]) < self.MaxNames:
+            names[1].append(fields[1].split(" ", 1)[0])
+
+        if len(summary.events) < self.MaxDetails:
+            summary.events.append((timestamp, fields))
+        else:
+            summary.dropped += 1
+
+        summary.last = timestamp
+
+        self.__model.set_fields(buffer, summary.index, ["Activity", self.__text__(summary)])
+
+        self.Events.inc()
+
+        return True
+
+    def get(self, summary_id=None, buffer=None):
+        if summary_id is None:
+            return self.__current.get(buffer)
+
+        return self.__summaries.get(summary_id)
+
+    @staticmethod
+    def __text__(summary):
+        parts = []
+
+        for (count, names), verb in ((summary.joined, "joined"), (summary.left, "left")):
+            if count > len(names):
+                parts.append("%d %s" % (count, verb))
+            elif count:
+                parts.append("%s %s" % (", ".join(names), verb))
+
+        text = "; ".join(parts)
+        last = summary.last.strftime("%H:%M:%S")
+
+        if last != summary.started.strftime("%H:%M:%S"):
+            text = "%s until %s" % (text, last)
+
+        return "%s (/expand %d)" % (text, summary.id)
@@ -0,0 +1,109 @@
+"""
+    project............: Handgurke
+    description........: ICB client
+    date...............: 06/2019
+    copyright..........: Sebastian Fedrau
+
+    Permission is hereby granted, free of charge, to any person obtaining
+    a copy of this software and associated documentation files (the
+    "Software"), to deal in the Software without restriction, including
+    without limitation the rights to use, copy, modify, merge, publish,
+    distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to
+    the following conditions:
+
+    The above copyright notice and this permission notice shall be
+    included in all copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+    IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+    OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+    ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+    OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+class Node:
+    __slots__ = ["children", "recent"]
+
+    def __init__(self):
+        self.children = {}
+        self.recent = []
+
+class Trie:
+    Candidates = 16
+
+    def __init__(self):
+        self.__root = Node()
+
+    def touch(self, word, active=True):
+        node = self.__root
+
+        for ch in word.lower():
+            child = node.children.get(ch)
+
+            if not child:
+                child = Node()
+                node.children[ch] = child
+
+            node = child
+
+            if active:
+                self.__promote__(node.recent, word)
+            elif not word in node.recent and len(node.recent) < self.Candidates:
+                node.recent.append(word)
+
+    def complete(self, prefix):
+        node = self.__root
+
+        for ch in prefix.lower():
+            node = node.children.get(ch)
+
+            if not node:
+                return []
+
+        return list(node.recent)
+
+    def __promote__(self, recent, word):
+        if recent and recent[0] == word:
+            return
+
+        try:
+            recent.remove(word)
+        except ValueError:
+            pass
+
+        recent.insert(0, word)
+
+        del recent[self.Candidates:]
+
+class Completer:
+    def __init__(self, commands=()):
+        self.__nicks = Trie()
+        self.__commands = Trie()
+
+        for command in commands:
+            self.__commands.touch(command, active=False)
+
+    def update(self, message_type, fields):
+        if message_type in "bc":
+            self.__nicks.touch(fields[0])
+        elif message_type == "i" and fields[0] == "wl":
+            self.__nicks.touch(fields[2], active=False)
+
+    def touch_command(self, command):
+        self.__commands.touch(command)
+
+    def complete(self, text, index):
+        start = text.rfind(" ", 0, index) + 1
+        word = text[start:index]
+
+        if start == 0 and word.startswith("/"):
+            candidates = ["/%s" % c for c in self.__commands.complete(word[1:])]
+        elif word:
+            candidates = self.__nicks.complete(word)
+        else:
+            candidates = []
+
+        return start, candidates
@@ -0,0 +1,127 @@
+"""
+    project............: Handgurke
+    description........: ICB client
+    date...............: 06/2019
+    copyright..........: Sebastian Fedrau
+
+    Permission is hereby granted, free of charge, to any person obtaining
+    a copy of this software and associated documentation files (the
+    "Software"), to deal in the Software without restriction, including
+    without limitation the rights to use, copy, modify, merge, publish,
+    distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to
+    the following conditions:
+
+    The above copyright notice and this permission notice shall be
+    included in all copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+    IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+    OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+    ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+    OTHER DEALINGS IN THE SOFTWARE.
+"""
+import re
+import stats
+
+HIGHLIGHT = 1
+
+class Rules:
+    Filtered = stats.registry.counter("handgurke_filtered_total", "Number of dropped messages by reason.", "reason")
+
+    def __init__(self, highlight=(), ignore=(), hide=()):
+        self.__highlight = list(highlight)
+        self.__ignore = set(n.lower() for n in ignore)
+        self.__hide = set(c.lower() for c in hide)
+        self.__search = None
+
+        self.__compile__()
+
+    @property
+    def highlights(self):
+        return list(self.__highlight)
+
+    @property
+    def ignored_nicks(self):
+        return sorted(self.__ignore)
+
+    @property
+    def hidden(self):
+        return sorted(self.__hide)
+
+    def toggle_highlight(self, word):
+        if word in self.__highlight:
+            self.__highlight.remove(word)
+        else:
+            self.__highlight.append(word)
+
+        self.__compile__()
+
+        return word in self.__highlight
+
+    def toggle(self, command, value):
+        if command == "highlight":
+            enabled = self.toggle_highlight(value)
+        elif command == "ignore":
+            enabled = self.toggle_ignore(value)
+        else:
+            enabled = self.toggle_hide(value)
+
+        return enabled
+
+    def toggle_ignore(self, nick):
+        return self.__toggle__(self.__ignore, nick.lower())
+
+    def toggle_hide(self, category):
+        return self.__toggle__(self.__hide, category.lower())
+
+    @staticmethod
+    def __toggle__(s, value):
+        if value in s:
+            s.remove(value)
+        else:
+            s.add(value)
+
+        return value in s
+
+    def __compile__(self):
+        if self.__highlight:
+            pattern = "|".join(r"(?<!\w)%s(?!\w)" % re.escape(w) for w in sorted(self.__highlight, key=len, reverse=True))
+
+            self.__search = re.compile(pattern, re.IGNORECASE).search
+        else:
+            self.__search = None
+
+    def ignored(self, nick):
+        if self.__ignore and nick.lower() in self.__ignore:
+            self.Filtered.inc(1, "ignore")
+
+            return True
+
+        return False
+
+    def apply(self, message_type, fields):
+        if message_type in "bck" and self.ignored(fields[0]):
+            return None
+
+        if message_type in "df" and self.__hide and fields[0].lower() in self.__hide:
+            self.Filtered.inc(1, "hide")
+
+            return None
+
+        flags = 0
+
+        if self.__search:
+            if message_type in "bcdf" or (message_type == "i" and fields[0] == "co"):
+                text = fields[1]
+            elif message_type == "e":
+                text = fields[0]
+            else:
+                text = ""
+
+            if self.__search(text):
+                flags |= HIGHLIGHT
+
+        return flags
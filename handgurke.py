@@ -24,23 +24,42 @@
     OTHER DEALINGS IN THE SOFTWARE.
 """
 import asyncio
-from datetime import datetime
+from datetime import datetime, timedelta
 import re
 import getopt
 import getpass
 import signal
 import sys
-import curses
 import ui
 import window
 import client
 import timer
 import beat
+import stats
+import profiling
+import roster
+import completion
+import scheduler
+import filters
+import capture
+import worker
+import chatlog
+import ltd
+import paste
+import localecho
+import plugins
+import remote
+import collapse
+
+# received messages processed between two frames
+MAX_BATCH = 64
+
+COMMANDS = ["quit", "stats", "profile", "who", "highlight", "ignore", "hide", "paste", "jump", "expand"]
 
 def get_opts(argv):
-    options, _ = getopt.getopt(argv, 's:p:n:g:SNMP:', ["server=", "port=", "nick=", "group=", "ssl", "no-verify", "enable-mouse", "password="])
+    options, _ = getopt.getopt(argv, 's:p:n:g:SNMP:', ["server=", "port=", "nick=", "group=", "ssl", "no-verify", "enable-mouse", "password=", "stats-socket=", "keepalive=", "max-missed-pongs=", "profile=", "highlight=", "ignore=", "hide=", "capture=", "log=", "workers=", "process-pool", "paste-interval=", "echo-timeout=", "plugin=", "split", "collapse="])
 
-    m = {"server": "internetcitizens.band", "ssl": False, "group": "", "verify_cert": True, "password": "", "mouse": False}
+    m = {"server": "internetcitizens.band", "ssl": False, "group": "", "verify_cert": True, "password": "", "mouse": False, "stats_socket": None, "keepalive": 10.0, "max_missed_pongs": 3, "profile": None, "highlight": [], "ignore": [], "hide": [], "capture": None, "log": None, "workers": 2, "process_pool": False, "paste_interval": 0.5, "echo_timeout": 10.0, "plugins": [], "split": False, "collapse": 300.0}
 
     for opt, arg in options:
         if opt in ('-s', '--server'):
@@ -59,6 +78,34 @@ def get_opts(argv):
             m["mouse"] = True
         elif opt in ('-P', '--password'):
             m["password"] = arg
+        elif opt == '--stats-socket':
+            m["stats_socket"] = arg
+        elif opt == '--keepalive':
+            m["keepalive"] = float(arg)
+        elif opt == '--max-missed-pongs':
+            m["max_missed_pongs"] = int(arg)
+        elif opt == '--profile':
+            m["profile"] = arg
+        elif opt == '--capture':
+            m["capture"] = arg
+        elif opt == '--log':
+            m["log"] = arg
+        elif opt == '--workers':
+            m["workers"] = int(arg)
+        elif opt == '--process-pool':
+            m["process_pool"] = True
+        elif opt == '--paste-interval':
+            m["paste_interval"] = float(arg)
+        elif opt == '--echo-timeout':
+            m["echo_timeout"] = float(arg)
+        elif opt == '--plugin':
+            m["plugins"].append(arg)
+        elif opt == '--split':
+            m["split"] = True
+        elif opt == '--collapse':
+            m["collapse"] = float(arg)
+        elif opt in ('--highlight', '--ignore', '--hide'):
+            m[opt[2:]] = [v.strip() for v in arg.split(",") if v.strip()]
 
     if not "port" in m:
         m["port"] = 7327 if m["ssl"] else 7326
@@ -78,44 +125,363 @@ def parse_message(message_type, fields):
 
         if m:
             result["group"] = m.group(1)
-            result["topic"] = ""
-    if message_type == "d" and fields[0] == "Topic":
-        m = re.match(r".*changed the topic to \"([\s\w]+)\".*", fields[1])
+    elif message_type == "d" and fields[0] == "Name":
+        m = re.match(r"^(\S+) changed nickname to (\S+)", fields[1])
 
-        if m and m.group(1) != "(None)":
-            result["topic"] = m.group(1)
-    elif message_type == "i" and fields[0] == "co":
-        m = re.match(r".*Topic: (.*)$", fields[1])
+        if m:
+            result["rename"] = (m.group(1), m.group(2))
+
+    return result
 
-        if not m:
-            m = re.match(r".*The topic is: (.*)$", fields[1])
+def route(model, group, message_type, fields):
+    if message_type in "ck":
+        return model.buffer(window.PRIVATE, fields[0])
 
-        if m and m.group(1) != "(None)":
-            result["topic"] = m.group(1)
+    if message_type == "i" and fields[0] == "co":
+        m = re.match(r"^<\*to: ([^*]+)\*>", fields[1])
 
-    return result
+        if m:
+            return model.buffer(window.PRIVATE, m.group(1))
+
+    if message_type in "bdf" and group:
+        return model.buffer(window.GROUP, group)
+
+    return model.buffer(window.SERVER, "server")
+
+def group_buffer(model, name):
+    for b in model.buffers:
+        if b.kind == window.GROUP and b.name.lower() == name.lower():
+            return b
+
+    return model.buffer(window.GROUP, name)
+
+class Dispatcher:
+    def __init__(self, model, client, completer, group_roster, nick, host=None, echo=None, collapser=None, log=None):
+        self.group = ""
+        self.nick = nick
+        self.pending_group = None
+        self.__model = model
+        self.__client = client
+        self.__completer = completer
+        self.__roster = group_roster
+        self.__host = host
+        self.__echo = echo
+        self.__collapser = collapser
+        self.__log = log
+
+    def dispatch(self, msg):
+        # processes msg and the queued messages up to one batch, returns the number of received messages
+        count = 0
+        batch = MAX_BATCH
+
+        while True:
+            if msg:
+                count += 1
+
+                self.__process__(*msg)
+            else:
+                self.__model.append_message(datetime.now(), "e", ["Connection timeout"])
+
+            batch -= 1
+
+            if not batch:
+                break
+
+            try:
+                msg = self.__client.read_nowait()
+            except asyncio.QueueEmpty:
+                break
+
+        return count
+
+    def __process__(self, message_type, fields):
+        model = self.__model
+
+        if message_type == "l":
+            self.__client.pong()
+        elif message_type in "bcdefki":
+            self.__completer.update(message_type, fields)
+
+            if self.__host:
+                self.__host.message(message_type, fields)
+
+            m = parse_message(message_type, fields)
+
+            if m.get("group", self.group) != self.group:
+                self.__roster.expect_listing()
+                self.__client.command("w", ".")
+
+                if self.pending_group and self.pending_group.name.lower() == m["group"].lower():
+                    # typed with different case
+                    self.pending_group.name = m["group"]
+
+                if model.active.kind == window.SERVER or (model.active.kind == window.GROUP and model.active.name == self.group):
+                    model.select(model.buffer(window.GROUP, m["group"]))
+
+            if "group" in m:
+                self.pending_group = None
+            elif message_type == "e" and self.pending_group:
+                # group change refused, back to the current group
+                if model.active is self.pending_group:
+                    model.select(model.buffer(window.GROUP, self.group) if self.group else model.buffer(window.SERVER, "server"))
 
-def send_line(client, line):
-    if line.startswith("/"):
+                self.pending_group = None
+
+            self.group = m.get("group", self.group)
+
+            if m.get("rename", (None,))[0] == self.nick:
+                self.nick = m["rename"][1]
+
+            if self.__roster.update(message_type, fields):
+                now = datetime.now()
+                buffer = route(model, self.group, message_type, fields)
+
+                if self.__echo and self.__echo.confirm(message_type, fields):
+                    # already displayed by the local echo
+                    appended = True
+                elif self.__collapser and self.__collapser.add(now, message_type, fields, buffer):
+                    # counted in a summary line
+                    appended = True
+                else:
+                    appended = model.append_message(now, message_type, fields, buffer)
+
+                if appended and self.__log:
+                    self.__log.append(now, message_type, fields)
+
+def buffer_title(buffer, r):
+    cached = r.get(buffer.name) if buffer.kind == window.GROUP else None
+
+    if cached and cached.topic:
+        title = "%s: %s" % (buffer.name, cached.topic)
+    elif buffer.kind == window.PRIVATE:
+        title = "Private: %s" % buffer.name
+    else:
+        title = buffer.name
+
+    return title
+
+def send_line(client, line, partner=None):
+    sent = []
+
+    if line.startswith("/m ") and " " in line[3:].strip():
+        partner, line = line[3:].strip().split(" ", 1)
+    elif line.startswith("/"):
         parts = line.split(" ", 1)
 
         if len(parts[0]) > 1:
             client.command(parts[0][1:], parts[1] if len(parts) > 1 else "")
 
-        if parts[0] == "/g" and len(parts) == 2:
-            client.command("topic")
+        return sent
+
+    for chunk in ltd.split_text(line.strip(), client.message_limit(partner)):
+        chunk = chunk.strip()
+
+        if partner:
+            client.private_message(partner, chunk)
+        else:
+            client.open_message(chunk)
+
+        sent.append((partner, chunk))
+
+    return sent
+
+def echo_lines(model, echo, group, nick, sent):
+    for partner, text in sent:
+        if partner:
+            echo.add(model.buffer(window.PRIVATE, partner), "i", ["co", "<*to: %s*> %s" % (partner, text)])
+        elif group:
+            echo.add(model.buffer(window.GROUP, group), "b", [nick, text])
+
+def show_stats(model):
+    now = datetime.now()
+
+    for l in stats.registry.summary():
+        model.append_message(now, "i", ["co", l])
+
+def profile(model, directory, arg):
+    now = datetime.now()
+
+    if arg == "start":
+        if profiling.profiler.running:
+            model.append_message(now, "e", ["Profiler is already running."])
+        else:
+            profiling.profiler.start()
+            model.append_message(now, "d", ["Profile", "Profiler started."])
+    elif arg == "stop":
+        if profiling.profiler.running:
+            try:
+                for filename in profiling.profiler.stop(directory):
+                    model.append_message(now, "d", ["Profile", "Wrote %s" % filename])
+            except OSError as e:
+                model.append_message(now, "e", [str(e)])
+        else:
+            model.append_message(now, "e", ["Profiler is not running."])
     else:
-        client.open_message(line)
+        model.append_message(now, "e", ["Usage: /profile start|stop"])
+
+def show_roster(model, r, arg):
+    now = datetime.now()
+
+    # the viewed group, cached members are shown right after /g
+    name = model.active.name if model.active.kind == window.GROUP and r.get(model.active.name) else r.group
+
+    try:
+        index = int(arg) - 1 if arg else 0
+
+        entries, index, pages = r.page(index, name=name)
+
+        model.append_message(now, "i", ["co", "Group: %s, page %d of %d (%d users)" % (name, index + 1, pages, len(r[name]))])
+
+        for fields in entries:
+            model.append_message(now, "i", fields)
+    except ValueError:
+        model.append_message(now, "e", ["Usage: /who [page]"])
+
+def jump(model, w, arg):
+    now = datetime.now()
+    timestamp = None
+
+    m = re.match(r"^(\d{1,2}):(\d{2})$", arg)
+
+    if m and int(m.group(1)) < 24 and int(m.group(2)) < 60:
+        timestamp = now.replace(hour=int(m.group(1)), minute=int(m.group(2)), second=0, microsecond=0)
+
+        if timestamp > now:
+            timestamp -= timedelta(days=1)
+    else:
+        m = re.match(r"^-(\d+)([dhm])$", arg)
+
+        if m:
+            timestamp = now - timedelta(**{{"d": "days", "h": "hours", "m": "minutes"}[m.group(2)]: int(m.group(1))})
+
+    if not timestamp:
+        model.append_message(now, "e", ["Usage: /jump HH:MM|-Nd|-Nh|-Nm"])
+    elif not w.jump(timestamp):
+        model.append_message(now, "e", ["No messages after %s." % timestamp.strftime("%Y-%m-%d %H:%M")])
+
+def expand(model, collapser, arg):
+    now = datetime.now()
+
+    try:
+        summary = collapser.get(int(arg) if arg else None, model.active) if collapser else None
+
+        if summary:
+            model.append_message(now, "i", ["co", "Summary %d, %d events since %s:" % (summary.id,
+                                                                                    len(summary.events) + summary.dropped,
+                                                                                    summary.started.strftime("%H:%M:%S"))])
+
+            for timestamp, fields in summary.events:
+                model.append_message(now, "i", ["co", "%s [%s] %s" % (timestamp.strftime("%H:%M:%S"), fields[0], fields[1])])
+
+            if summary.dropped:
+                model.append_message(now, "i", ["co", "%d more events not kept." % summary.dropped])
+        else:
+            model.append_message(now, "e", ["No summary found."])
+    except ValueError:
+        model.append_message(now, "e", ["Usage: /expand [number]"])
+
+def toggle_rule(model, rules, command, arg, client=None):
+    now = datetime.now()
+
+    if arg:
+        enabled = rules.toggle(command, arg)
+
+        if client:
+            client.toggle_rule(command, arg)
+
+        model.append_message(now, "d", ["Filter", "%s %s %s %s list." % ("Added" if enabled else "Removed", arg, "to" if enabled else "from", command)])
+    else:
+        if command == "highlight":
+            values = rules.highlights
+        elif command == "ignore":
+            values = rules.ignored_nicks
+        else:
+            values = rules.hidden
+
+        model.append_message(now, "d", ["Filter", "%s: %s" % (command, ", ".join(values) if values else "(none)")])
 
 async def run():
     opts = get_opts(sys.argv[1:])
 
-    icb_client = client.Client(opts["server"], opts["port"], use_ssl=opts["ssl"], verify_cert=opts["verify_cert"])
+    timers = scheduler.Scheduler()
+    rules = filters.Rules(highlight=opts["highlight"], ignore=opts["ignore"], hide=opts["hide"])
+    capture_writer = None
+    log = None
+    exporter = None
+    host = None
+
+    if opts["stats_socket"]:
+        exporter = stats.Exporter(opts["stats_socket"])
+
+        try:
+            await exporter.start()
+        except OSError as e:
+            print(e, file=sys.stderr)
+            return
+
+    if opts["split"]:
+        # the network process answers pings, keeps the log and writes the capture
+        icb_client = remote.start(opts, filters=rules)
+    else:
+        capture_writer = capture.Writer(opts["capture"]) if opts["capture"] else None
+
+        icb_client = client.Client(opts["server"],
+                                   opts["port"],
+                                   use_ssl=opts["ssl"],
+                                   verify_cert=opts["verify_cert"],
+                                   max_missed_pongs=opts["max_missed_pongs"],
+                                   scheduler=timers,
+                                   filters=rules,
+                                   capture_writer=capture_writer)
+
+    pool = worker.Pool(workers=opts["workers"], processes=opts["process_pool"])
 
     with ui.Ui(mouse=opts["mouse"]) as stdscr:
-        model = window.ViewModel()
+        model = window.ViewModel(rules)
+        group_roster = roster.Roster()
+        completer = completion.Completer(COMMANDS + client.COMMANDS)
+
+        wakeup_f = asyncio.get_event_loop().create_future()
+
+        def wakeup():
+            if not wakeup_f.done():
+                wakeup_f.set_result(None)
+
+        w = window.Window(stdscr, model, completer, pool=pool, notify=wakeup)
+
+        def log_error(text):
+            model.append_message(datetime.now(), "e", [text])
+
+            wakeup()
+
+        if opts["log"] and not opts["split"]:
+            log = chatlog.Log(opts["log"], pool, report=log_error)
+
+        profiling.profiler.probe("ViewModel.messages", lambda: len(model.messages))
+        profiling.profiler.probe("Window.display_lines", lambda: w.display_lines)
+
+        def plugin_output(text):
+            model.append_message(datetime.now(), "d", ["Plugin", text], model.buffer(window.SERVER, "server"))
+            wakeup()
+
+        def plugin_send(text, partner):
+            try:
+                send_line(icb_client, text, partner)
+            except: pass
+
+        api = plugins.Api(asyncio.get_event_loop(), plugin_send, icb_client.command, plugin_output)
+        host = plugins.Host(api, pool, report=plugin_output)
 
-        w = window.Window(stdscr, model)
+        for name in opts["plugins"]:
+            try:
+                module = plugins.load(name)
+
+                host.add(module.__name__, module)
+            except Exception as e:
+                plugin_output("Couldn't load %s: %s" % (name, e))
+
+        if opts["profile"]:
+            profiling.profiler.start()
 
         with ui.KeyReader(stdscr) as queue:
             connection_f = asyncio.ensure_future(asyncio.sleep(0))
@@ -123,26 +489,50 @@ async def run():
             input_f = asyncio.ensure_future(queue.get())
             timer_f = asyncio.ensure_future(asyncio.sleep(0))
 
+            if opts["keepalive"] > 0:
+                keepalive_f = timers.sleep(opts["keepalive"])
+            else:
+                keepalive_f = asyncio.get_event_loop().create_future()
+
             last_login_attempt = None
 
-            group = ""
-            topic = ""
+            echo = localecho.Tracker(model, timers, opts["echo_timeout"], notify=wakeup) if opts["echo_timeout"] > 0 else None
+            collapser = collapse.Collapser(model, opts["collapse"], rules) if opts["collapse"] > 0 else None
+
+            dispatcher = Dispatcher(model, icb_client, completer, group_roster, opts["nick"], host, echo, collapser, log)
+
+            pasting = None
+            paste_buffer = None
+
+            def paste_progress(p):
+                if not p.running:
+                    if p.error:
+                        model.append_message(datetime.now(), "e", ["Paste stopped after %d lines: %s" % (p.sent_lines, p.error)])
+                    else:
+                        model.append_message(datetime.now(), "d", ["Paste", "Sent %d lines in %d packets." % (p.sent_lines, p.sent_packets)])
+
+                wakeup()
 
             quit = False
 
             while not quit:
-                if topic:
-                    model.title = "%s: %s" % (group, topic)
-                else:
-                    model.title = group
+                model.title = buffer_title(model.active, group_roster)
+
+                if pasting and pasting.running:
+                    model.title = "%s (paste %d%%)" % (model.title, pasting.progress)
+                elif paste_buffer is not None:
+                    model.title = "%s (paste: %d lines)" % (model.title, len(paste_buffer))
 
-                w.refresh()
+                with profiling.section("render"):
+                    w.refresh()
 
-                done, _ = await asyncio.wait([client_f, input_f, timer_f, connection_f], return_when=asyncio.FIRST_COMPLETED)
+                done, _ = await asyncio.wait([client_f, input_f, timer_f, keepalive_f, connection_f, wakeup_f], return_when=asyncio.FIRST_COMPLETED)
 
                 for f in done:
                     if f is connection_f:
-                        if not last_login_attempt or last_login_attempt.elapsed() >= 10.0:
+                        if last_login_attempt and last_login_attempt.elapsed() < 10.0:
+                            connection_f = timers.sleep(10.0 - last_login_attempt.elapsed())
+                        else:
                             last_login_attempt = timer.Timer()
 
                             model.append_message(datetime.now(), "d", ["Connection", "Connecting to %s:%d..." % (opts["server"], opts["port"])])
@@ -152,7 +542,7 @@ async def run():
                             try:
                                 connection_f = await icb_client.connect()
 
-                                icb_client.login(opts["loginid"], opts["nick"], group if group else opts["group"], opts["password"])
+                                icb_client.login(opts["loginid"], opts["nick"], dispatcher.group if dispatcher.group else opts["group"], opts["password"])
 
                                 icb_client.command("echoback", "verbose")
                                 icb_client.command("topic")
@@ -162,54 +552,131 @@ async def run():
 
                             if not connection_f:
                                 model.append_message(datetime.now(), "d", ["Connection", "Reconnecting in 10 seconds..."])
-                                connection_f = asyncio.ensure_future(asyncio.sleep(10))
+                                connection_f = timers.sleep(10)
                     elif f is client_f:
-                        msg = f.result()
+                        with profiling.section("dispatch"):
+                            dispatcher.dispatch(f.result())
 
-                        if msg:
-                            message_type, fields = msg
+                        client_f = asyncio.ensure_future(icb_client.read())
+                    elif f is input_f:
+                        with profiling.section("input"):
+                            ch = f.result()
+
+                            if ch == "\n":
+                                line = model.text.strip()
+
+                                if line.startswith("/"):
+                                    completer.touch_command(line[1:].split(" ", 1)[0])
+
+                                if paste_buffer is not None and not (line == "/paste" or line.startswith("/paste ")):
+                                    paste_buffer.append(model.text)
+                                elif line == "/quit":
+                                    try:
+                                        icb_client.quit()
+                                    except: pass
+
+                                    quit = True
+                                elif line == "/stats":
+                                    show_stats(model)
+                                elif line == "/who" or line.startswith("/who "):
+                                    show_roster(model, group_roster, line[4:].strip())
+                                elif line.split(" ", 1)[0] in ["/highlight", "/ignore", "/hide"]:
+                                    parts = line.split(" ", 1)
+
+                                    toggle_rule(model, rules, parts[0][1:], parts[1].strip() if len(parts) > 1 else "", icb_client if opts["split"] else None)
+                                elif line.startswith("/profile"):
+                                    profile(model, opts["profile"] or ".", line[8:].strip())
+                                elif line == "/jump" or line.startswith("/jump "):
+                                    jump(model, w, line[5:].strip())
+                                elif line == "/expand" or line.startswith("/expand "):
+                                    expand(model, collapser, line[7:].strip())
+                                elif line == "/paste" or line.startswith("/paste "):
+                                    arg = line[6:].strip()
+                                    target = model.active.name if model.active.kind == window.PRIVATE else None
+
+                                    if arg == "cancel":
+                                        if pasting and pasting.running:
+                                            pasting.cancel()
+                                        elif paste_buffer is not None:
+                                            paste_buffer = None
+                                            model.append_message(datetime.now(), "d", ["Paste", "Discarded collected lines."])
+                                        else:
+                                            model.append_message(datetime.now(), "e", ["Nothing to cancel."])
+                                    elif pasting and pasting.running:
+                                        model.append_message(datetime.now(), "e", ["A paste is running, enter /paste cancel to abort it."])
+                                    elif arg == "end":
+                                        if paste_buffer is None:
+                                            model.append_message(datetime.now(), "e", ["Usage: /paste [FILE|end|cancel]"])
+                                        else:
+                                            pasting = paste.Paste.from_lines(icb_client, timers, paste_buffer, nick=target, interval=opts["paste_interval"], notify=paste_progress)
+                                            paste_buffer = None
+                                            pasting.start()
+                                    elif arg:
+                                        try:
+                                            pasting = paste.Paste.from_file(icb_client, timers, arg, nick=target, interval=opts["paste_interval"], notify=paste_progress)
+                                            pasting.start()
+                                        except OSError as e:
+                                            model.append_message(datetime.now(), "e", [str(e)])
+                                    else:
+                                        paste_buffer = []
+                                        model.append_message(datetime.now(), "d", ["Paste", "Collecting lines, enter /paste end to send or /paste cancel to discard them."])
+                                else:
+                                    try:
+                                        sent = send_line(icb_client, line, model.active.name if model.active.kind == window.PRIVATE else None)
+
+                                        if echo:
+                                            echo_lines(model, echo, dispatcher.group, dispatcher.nick, sent)
+
+                                        if line.startswith("/g ") and line[3:].strip():
+                                            # shown from the cache at once, reconciled when the server's status arrives
+                                            dispatcher.pending_group = group_buffer(model, line[3:].split()[0])
+
+                                            model.select(dispatcher.pending_group)
+
+                                        for partner, text in sent:
+                                            host.send(text, partner)
+                                    except: pass
+
+                                model.text = ""
+                            else:
+                                w.send_key(ch)
 
-                            if message_type == "l":
-                                icb_client.pong()
-                            elif message_type in "bcdefki":
-                                model.append_message(datetime.now(), message_type, fields)
+                        input_f = asyncio.ensure_future(queue.get())
+                    elif f is timer_f:
+                        model.time = beat.now()
+                        timer_f = timers.sleep(beat.remaining(datetime.now()))
+                    elif f is keepalive_f:
+                        if not icb_client.keepalive():
+                            model.append_message(datetime.now(), "e", ["No response from server, connection closed."])
 
-                                m = parse_message(message_type, fields)
+                        model.rtt = "%dms" % (icb_client.rtt * 1000) if icb_client.rtt is not None else ""
 
-                                group = m.get("group", group)
-                                topic = m.get("topic", topic)
-                        else:
-                            model.append_message(datetime.now(), "e", ["Connection timeout"])
+                        keepalive_f = timers.sleep(opts["keepalive"])
+                    elif f is wakeup_f:
+                        wakeup_f = asyncio.get_event_loop().create_future()
 
-                        client_f = asyncio.ensure_future(icb_client.read())
-                    elif f is input_f:
-                        ch = f.result()
+    if exporter:
+        exporter.close()
 
-                        if ch == "\n":
-                            line = model.text.strip()
+    if profiling.profiler.running:
+        try:
+            profiling.profiler.stop(opts["profile"] or ".")
+        except OSError as e:
+            print(e, file=sys.stderr)
 
-                            if line == "/quit":
-                                try:
-                                    icb_client.quit()
-                                except: pass
+    if capture_writer:
+        capture_writer.close()
 
-                                quit = True
-                            else:
-                                try:
-                                    send_line(icb_client, line)
-                                except: pass
+    if log:
+        log.close()
 
-                            model.text = ""
-                        else:
-                            if ch == curses.KEY_RESIZE:
-                                w.clear()
+    if opts["split"]:
+        icb_client.shutdown()
 
-                            w.send_key(ch)
+    if host:
+        host.close()
 
-                        input_f = asyncio.ensure_future(queue.get())
-                    elif f is timer_f:
-                        model.time = beat.now()
-                        timer_f = asyncio.ensure_future(asyncio.sleep(1))
+    pool.shutdown()
 
 if __name__ == "__main__":
     def signal_handler(sig, frame):
@@ -0,0 +1,99 @@
+"""
+    project............: Handgurke
+    description........: ICB client
+    date...............: 06/2019
+    copyright..........: Sebastian Fedrau
+
+    Permission is hereby granted, free of charge, to any person obtaining
+    a copy of this software and associated documentation files (the
+    "Software"), to deal in the Software without restriction, including
+    without limitation the rights to use, copy, modify, merge, publish,
+    distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to
+    the following conditions:
+
+    The above copyright notice and this permission notice shall be
+    included in all copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+    IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+    OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+    ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+    OTHER DEALINGS IN THE SOFTWARE.
+"""
+from collections import deque
+from datetime import datetime
+import stats
+import timer
+
+PENDING = 2
+FAILED = 4
+
+class Entry:
+    __slots__ = ["buffer", "index", "message_type", "fields", "elapsed", "timeout"]
+
+    def __init__(self, buffer, index, message_type, fields, timeout):
+        self.buffer = buffer
+        self.index = index
+        self.message_type = message_type
+        self.fields = fields
+        self.elapsed = timer.Timer()
+        self.timeout = timeout
+
+class Tracker:
+    Confirmed = stats.registry.counter("handgurke_echo_confirmed_total", "Number of local echoes confirmed by the server.")
+    Failed = stats.registry.counter("handgurke_echo_failed_total", "Number of local echoes without server echo.")
+    Latency = stats.registry.histogram("handgurke_echo_seconds", "Time between sending a message and its server echo.")
+
+    def __init__(self, model, scheduler, timeout=10.0, notify=None):
+        self.__model = model
+        self.__scheduler = scheduler
+        self.__timeout = timeout
+        self.__notify = notify
+        self.__pending = deque()
+
+    @property
+    def pending(self):
+        return len(self.__pending)
+
+    def add(self, buffer, message_type, fields):
+        if self.__model.append_message(datetime.now(), message_type, fields, buffer, PENDING):
+            entry = Entry(buffer, len(buffer.messages) - 1, message_type, fields, None)
+            entry.timeout = self.__scheduler.call_later(self.__timeout, self.__expire__, entry)
+
+            self.__pending.append(entry)
+
+    def confirm(self, message_type, fields):
+        for entry in self.__pending:
+            if entry.message_type == message_type and entry.fields == fields:
+                entry.timeout.cancel()
+
+                self.__pending.remove(entry)
+                self.__set_flags__(entry, 0)
+
+                self.Confirmed.inc()
+                self.Latency.observe(entry.elapsed.elapsed())
+
+                return True
+
+        return False
+
+    def __expire__(self, entry):
+        try:
+            self.__pending.remove(entry)
+        except ValueError:
+            return
+
+        self.__set_flags__(entry, FAILED)
+
+        self.Failed.inc()
+
+        if self.__notify:
+            self.__notify()
+
+    def __set_flags__(self, entry, flags):
+        _, _, _, old_flags = entry.buffer.messages[entry.index]
+
+        self.__model.set_flags(entry.buffer, entry.index, (old_flags & ~(PENDING | FAILED)) | flags)
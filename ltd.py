@@ -63,6 +63,27 @@ def encode_str(T, text):
 def encode_empty_cmd(T):
     return encode_str(T, "")
 
+def split_text(text, limit):
+    data = text.encode("UTF-8", "backslashreplace")
+
+    while len(data) > limit:
+        cut = data.rfind(b" ", 0, limit + 1)
+
+        if cut < limit // 2:
+            cut = limit
+
+            while cut > 0 and (data[cut] & 0xc0) == 0x80:
+                cut -= 1
+
+            chunk, data = data[:cut], data[cut:]
+        else:
+            chunk, data = data[:cut], data[cut + 1:]
+
+        yield chunk.decode("UTF-8")
+
+    if data:
+        yield data.decode("UTF-8")
+
 class Decoder:
     def __init__(self):
         self.__buffer = bytearray()
@@ -79,16 +100,25 @@ class Decoder:
         self.__process__()
 
     def __process__(self):
-        length = len(self.__buffer)
+        buffer = self.__buffer
+        length = len(buffer)
+        offset = 0
 
-        if length >= 2 and length - 1 >= self.__buffer[0]:
-            p_length = self.__buffer[0]
+        while length - offset >= 2 and length - offset - 1 >= buffer[offset]:
+            p_length = buffer[offset]
 
             for f in self.__listeners:
-                f(chr(self.__buffer[1]), self.__buffer[2:p_length + 1])
+                f(chr(buffer[offset + 1]), buffer[offset + 2:offset + p_length + 1])
+
+            offset += p_length + 1
+
+        if offset:
+            del buffer[:offset]
+
+def first_field(payload):
+    index = payload.find(1)
 
-            self.__buffer = self.__buffer[p_length + 1:]
-            self.__process__()
+    return payload[:index] if index >= 0 else payload
 
 def split(payload):
     fields = []
@@ -0,0 +1,153 @@
+"""
+    project............: Handgurke
+    description........: ICB client
+    date...............: 06/2019
+    copyright..........: Sebastian Fedrau
+
+    Permission is hereby granted, free of charge, to any person obtaining
+    a copy of this software and associated documentation files (the
+    "Software"), to deal in the Software without restriction, including
+    without limitation the rights to use, copy, modify, merge, publish,
+    distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to
+    the following conditions:
+
+    The above copyright notice and this permission notice shall be
+    included in all copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+    IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+    OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+    ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+    OTHER DEALINGS IN THE SOFTWARE.
+"""
+import os
+import ltd
+import stats
+
+def read_file(filename):
+    with open(filename, encoding="UTF-8", errors="replace") as f:
+        for line in f:
+            yield line
+
+class Paste:
+    Lines = stats.registry.counter("handgurke_paste_lines_total", "Number of pasted lines.")
+    Packets = stats.registry.counter("handgurke_paste_packets_total", "Number of packets sent by /paste.")
+
+    def __init__(self, client, scheduler, lines, size, nick=None, interval=0.5, notify=None):
+        self.__client = client
+        self.__scheduler = scheduler
+        self.__lines = lines
+        self.__size = max(size, 1)
+        self.__nick = nick
+        self.__interval = interval
+        self.__notify = notify
+        self.__chunks = self.__split__()
+        self.__read = 0
+        self.__sent_lines = 0
+        self.__sent_packets = 0
+        self.__timer = None
+        self.__error = None
+
+    @staticmethod
+    def from_file(client, scheduler, filename, **kwargs):
+        return Paste(client, scheduler, read_file(filename), os.path.getsize(filename), **kwargs)
+
+    @staticmethod
+    def from_lines(client, scheduler, lines, **kwargs):
+        return Paste(client, scheduler, iter(lines), sum(len(l.encode("UTF-8")) + 1 for l in lines), **kwargs)
+
+    @property
+    def progress(self):
+        return min(int(self.__read * 100 / self.__size), 100)
+
+    @property
+    def sent_lines(self):
+        return self.__sent_lines
+
+    @property
+    def sent_packets(self):
+        return self.__sent_packets
+
+    @property
+    def error(self):
+        return self.__error
+
+    @property
+    def running(self):
+        return self.__timer is not None
+
+    def start(self):
+        self.__timer = self.__scheduler.call_every(self.__interval, self.__tick__)
+
+        self.__tick__()
+
+    def cancel(self):
+        self.__finish__("Cancelled.")
+
+    def __split__(self):
+        limit = self.__client.message_limit(self.__nick)
+
+        for line in self.__lines:
+            self.__read += len(line.encode("UTF-8")) + (0 if line.endswith("\n") else 1)
+
+            line = line.rstrip("\r\n")
+
+            if line.strip():
+                chunks = list(ltd.split_text(line.expandtabs(), limit))
+
+                for i, chunk in enumerate(chunks):
+                    yield chunk, i == len(chunks) - 1
+
+    def __tick__(self):
+        try:
+            chunk, last = next(self.__chunks, (None, False))
+
+            if chunk is None:
+                self.__finish__()
+            elif not self.__client.connected:
+                self.__finish__("Not connected.")
+            else:
+                self.__client.write(self.__encode__(chunk))
+
+                self.__sent_packets += 1
+                self.Packets.inc()
+
+                if last:
+                    self.__sent_lines += 1
+                    self.Lines.inc()
+
+                if self.__notify:
+                    self.__notify(self)
+        except Exception as e:
+            self.__finish__(str(e))
+
+    def __encode__(self, chunk):
+        # not stripped like Client.open_message() does, indentation is kept
+        if self.__nick:
+            e = ltd.Encoder("h")
+
+            e.add_field_str("m")
+            e.add_field_str("%s %s" % (self.__nick, chunk))
+
+            return e.encode()
+
+        return ltd.encode_str("b", chunk)
+
+    def __finish__(self, error=None):
+        if self.__timer:
+            self.__timer.cancel()
+            self.__timer = None
+
+            self.__chunks.close()
+
+            try:
+                self.__lines.close()
+            except AttributeError: pass
+
+            self.__error = error
+
+            if self.__notify:
+                self.__notify(self)
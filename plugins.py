@@ -0,0 +1,327 @@
+"""
+    project............: Handgurke
+    description........: ICB client
+    date...............: 06/2019
+    copyright..........: Sebastian Fedrau
+
+    Permission is hereby granted, free of charge, to any person obtaining
+    a copy of this software and associated documentation files (the
+    "Software"), to deal in the Software without restriction, including
+    without limitation the rights to use, copy, modify, merge, publish,
+    distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to
+    the following conditions:
+
+    The above copyright notice and this permission notice shall be
+    included in all copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+    IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+    OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+    ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+    OTHER DEALINGS IN THE SOFTWARE.
+"""
+import asyncio
+import concurrent.futures
+import importlib
+import importlib.util
+import os
+import threading
+import types
+import stats
+import timer
+import session
+
+def load(name):
+    if name.endswith(".py"):
+        spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(name))[0], name)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(name)
+
+    return module
+
+@types.coroutine
+def measure(coro, on_step, on_start=None):
+    # drives the coroutine like a task does and times each step between two suspensions
+    value = None
+    error = None
+
+    while True:
+        if on_start:
+            on_start()
+
+        elapsed = timer.Timer()
+
+        try:
+            if error:
+                awaitable = coro.throw(error)
+            else:
+                awaitable = coro.send(value)
+        except StopIteration as ex:
+            on_step(elapsed.elapsed())
+
+            return ex.value
+        except BaseException:
+            on_step(elapsed.elapsed())
+            raise
+
+        on_step(elapsed.elapsed())
+
+        try:
+            value = yield awaitable
+            error = None
+        except BaseException as ex:
+            value = None
+            error = ex
+
+async def measured(coro, on_step, on_start=None):
+    return await measure(coro, on_step, on_start)
+
+def run_isolated(fn, *args):
+    loop = asyncio.new_event_loop()
+
+    try:
+        loop.run_until_complete(fn(*args))
+    finally:
+        loop.close()
+
+class Runner:
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.blocking = None
+        self.step = timer.Timer()
+        self.__tasks = set()
+        self.__stopped = False
+
+        threading.Thread(target=self.__run__, name="plugins", daemon=True).start()
+
+    def __run__(self):
+        asyncio.set_event_loop(self.loop)
+
+        try:
+            self.loop.run_forever()
+
+            for task in self.__tasks:
+                task.cancel()
+
+            self.loop.run_until_complete(asyncio.gather(*self.__tasks, return_exceptions=True))
+        finally:
+            self.loop.close()
+
+    def submit(self, coro):
+        f = concurrent.futures.Future()
+
+        self.loop.call_soon_threadsafe(self.__start__, coro, f)
+
+        return f
+
+    def __start__(self, coro, f):
+        if self.__stopped or f.cancelled():
+            coro.close()
+            f.cancel()
+        else:
+            task = self.loop.create_task(coro)
+
+            self.__tasks.add(task)
+
+            task.add_done_callback(lambda task: self.__finished__(task, f))
+
+    def __finished__(self, task, f):
+        self.__tasks.discard(task)
+
+        if f.done():
+            pass
+        elif task.cancelled():
+            f.cancel()
+        elif task.exception():
+            f.set_exception(task.exception())
+        else:
+            f.set_result(task.result())
+
+    def begin(self, handler):
+        self.step.restart()
+        self.blocking = handler
+
+    def end(self):
+        self.blocking = None
+
+    def stop(self):
+        self.__stopped = True
+
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+class Api:
+    def __init__(self, loop, send, command, display):
+        self.__loop = loop
+        self.__send = send
+        self.__command = command
+        self.__display = display
+
+    def send(self, text, nick=None):
+        self.__loop.call_soon_threadsafe(self.__send, text, nick)
+
+    def command(self, command, arg=""):
+        self.__loop.call_soon_threadsafe(self.__command, command, arg)
+
+    def display(self, text):
+        self.__loop.call_soon_threadsafe(self.__display, text)
+
+class Handler:
+    def __init__(self, plugin, event, fn):
+        self.plugin = plugin
+        self.event = event
+        self.fn = fn
+        self.overruns = 0
+        self.demoted = False
+        self.running = 0
+
+class Host:
+    StepBudget = 0.01
+    Timeout = 5.0
+    Grace = 1.0
+    MaxOverruns = 3
+    MaxRunning = 16
+
+    Calls = stats.registry.counter("handgurke_plugin_calls_total", "Number of plugin handler calls.", "plugin")
+    Time = stats.registry.counter("handgurke_plugin_seconds_total", "Time plugin handlers blocked the event loop.", "plugin")
+    Overruns = stats.registry.counter("handgurke_plugin_overruns_total", "Number of plugin handler calls over budget.", "plugin")
+    Dropped = stats.registry.counter("handgurke_plugin_dropped_total", "Number of events not delivered to busy plugins.", "plugin")
+
+    def __init__(self, api, pool, report=None, loop=None):
+        self.__api = api
+        self.__pool = pool
+        self.__report = report
+        self.__loop = loop if loop else asyncio.get_event_loop()
+        self.__handlers = {"message": [], "send": []}
+        self.__runner = None
+        self.__pending = set()
+        self.__watchdog = None
+
+    def add(self, name, module):
+        for event in self.__handlers:
+            fn = getattr(module, "on_%s" % event, None)
+
+            if fn:
+                self.__handlers[event].append(Handler(name, event, fn))
+
+    def message(self, message_type, fields):
+        if self.__handlers["message"]:
+            self.__dispatch__("message", session.convert(message_type, fields))
+
+    def send(self, line, nick=None):
+        self.__dispatch__("send", line, nick)
+
+    def __dispatch__(self, event, *args):
+        for handler in self.__handlers[event]:
+            if handler.running >= self.MaxRunning:
+                self.Dropped.inc(1, handler.plugin)
+            else:
+                handler.running += 1
+
+                self.Calls.inc(1, handler.plugin)
+
+                if handler.demoted:
+                    f = self.__pool.submit_isolated(run_isolated, handler.fn, self.__api, *args)
+
+                    asyncio.ensure_future(self.__wait_isolated__(handler, f), loop=self.__loop)
+                else:
+                    # handlers run on the plugin thread, never on the event loop of the UI
+                    if not self.__runner:
+                        self.__runner = Runner()
+
+                    runner = self.__runner
+                    f = asyncio.wrap_future(runner.submit(self.__run__(handler, args, runner)), loop=self.__loop)
+
+                    self.__pending.add(f)
+
+                    f.add_done_callback(self.__pending.discard)
+
+                    if not self.__watchdog:
+                        self.__watchdog = asyncio.ensure_future(self.__watch__(), loop=self.__loop)
+
+                f.add_done_callback(lambda f, handler=handler: self.__done__(handler, f))
+
+    async def __watch__(self):
+        # the plugin loop cannot time out a step that blocks it, so it's watched from here
+        while self.__pending:
+            await asyncio.sleep(self.Grace)
+
+            runner = self.__runner
+            handler = runner.blocking if runner else None
+
+            if handler and runner.step.elapsed() > self.Timeout:
+                self.__runner = None
+
+                runner.stop()
+
+                for f in list(self.__pending):
+                    f.cancel()
+
+                self.Overruns.inc(1, handler.plugin)
+
+                handler.demoted = True
+
+                self.__report__("%s.on_%s blocks the plugin thread, moved to a worker thread." % (handler.plugin, handler.event))
+
+        self.__watchdog = None
+
+    async def __wait_isolated__(self, handler, f):
+        # the thread cannot be stopped, the handler stays counted as running until it returns
+        try:
+            await asyncio.wait_for(asyncio.shield(f), self.Timeout)
+        except asyncio.TimeoutError:
+            self.Overruns.inc(1, handler.plugin)
+
+            self.__report__("%s.on_%s did not return within %g seconds." % (handler.plugin, handler.event, self.Timeout))
+        except Exception:
+            # reported by __done__
+            pass
+
+    async def __run__(self, handler, args, runner):
+        overrun = [False]
+
+        def on_start():
+            runner.begin(handler)
+
+        def on_step(seconds):
+            runner.end()
+
+            self.Time.inc(seconds, handler.plugin)
+
+            if seconds > self.StepBudget:
+                overrun[0] = True
+
+        try:
+            await asyncio.wait_for(measured(handler.fn(self.__api, *args), on_step, on_start), self.Timeout)
+        except asyncio.TimeoutError:
+            overrun[0] = True
+
+        if overrun[0]:
+            self.Overruns.inc(1, handler.plugin)
+
+            handler.overruns += 1
+
+            if handler.overruns >= self.MaxOverruns and not handler.demoted:
+                handler.demoted = True
+
+                self.__report__("%s.on_%s is too slow, moved to a worker thread." % (handler.plugin, handler.event))
+
+    def __done__(self, handler, f):
+        handler.running -= 1
+
+        if not f.cancelled() and f.exception():
+            self.__report__("%s.on_%s failed: %s" % (handler.plugin, handler.event, f.exception()))
+
+    def close(self):
+        if self.__runner:
+            self.__runner.stop()
+            self.__runner = None
+
+    def __report__(self, text):
+        # called from the plugin thread too
+        if self.__report:
+            self.__loop.call_soon_threadsafe(self.__report, text)
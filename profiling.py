@@ -0,0 +1,189 @@
+"""
+    project............: Handgurke
+    description........: ICB client
+    date...............: 06/2019
+    copyright..........: Sebastian Fedrau
+
+    Permission is hereby granted, free of charge, to any person obtaining
+    a copy of this software and associated documentation files (the
+    "Software"), to deal in the Software without restriction, including
+    without limitation the rights to use, copy, modify, merge, publish,
+    distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to
+    the following conditions:
+
+    The above copyright notice and this permission notice shall be
+    included in all copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+    IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+    OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+    ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+    OTHER DEALINGS IN THE SOFTWARE.
+"""
+import asyncio
+import cProfile
+import pstats
+import tracemalloc
+import os
+from datetime import datetime
+
+class Section:
+    def __init__(self, profiler, name):
+        self.__profiler = profiler
+        self.__name = name
+
+    def __enter__(self):
+        if self.__profiler.running:
+            self.__profiler.__enter_section__(self.__name)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.__profiler.running:
+            self.__profiler.__leave_section__(self.__name)
+
+class Profiler:
+    SnapshotInterval = 30.0
+    TopStats = 25
+
+    def __init__(self):
+        self.__running = False
+        self.__sections = {}
+        self.__profiles = {}
+        self.__stack = []
+        self.__probes = {}
+        self.__baseline = None
+        self.__last = None
+        self.__report = []
+        self.__task = None
+        self.__started = None
+
+    @property
+    def running(self):
+        return self.__running
+
+    def section(self, name):
+        section = self.__sections.get(name)
+
+        if not section:
+            section = Section(self, name)
+            self.__sections[name] = section
+
+        return section
+
+    def probe(self, name, fn):
+        self.__probes[name] = fn
+
+    def start(self):
+        if not self.__running:
+            self.__running = True
+            self.__started = datetime.now()
+            self.__profiles = {}
+            self.__stack = []
+            self.__report = []
+
+            tracemalloc.start()
+
+            self.__baseline = self.__last = tracemalloc.take_snapshot()
+
+            self.__task = asyncio.ensure_future(self.__take_snapshots__())
+
+    def stop(self, directory):
+        if not self.__running:
+            return []
+
+        self.snapshot()
+
+        self.__running = False
+        self.__task.cancel()
+
+        for name in reversed(self.__stack):
+            self.__profiles[name].disable()
+
+        self.__stack = []
+
+        files = []
+
+        try:
+            path = os.path.join(directory, "profile-%s" % self.__started.strftime("%Y%m%d-%H%M%S"))
+
+            os.makedirs(path, exist_ok=True)
+
+            for name, profile in sorted(self.__profiles.items()):
+                filename = os.path.join(path, "%s.prof" % name)
+
+                profile.dump_stats(filename)
+                files.append(filename)
+
+                filename = os.path.join(path, "%s.txt" % name)
+
+                with open(filename, "w") as f:
+                    pstats.Stats(profile, stream=f).sort_stats("cumulative").print_stats(self.TopStats)
+
+                files.append(filename)
+
+            filename = os.path.join(path, "memory.txt")
+
+            with open(filename, "w") as f:
+                f.write("\n".join(self.__report))
+                f.write("\n\n%s (growth since start)\n" % datetime.now().strftime("%X"))
+
+                for stat in tracemalloc.take_snapshot().compare_to(self.__baseline, "lineno")[:self.TopStats]:
+                    f.write("%s\n" % stat)
+
+            files.append(filename)
+        finally:
+            tracemalloc.stop()
+
+            self.__baseline = self.__last = None
+            self.__profiles = {}
+
+        return files
+
+    def snapshot(self):
+        snapshot = tracemalloc.take_snapshot()
+
+        self.__report.append("%s (growth since previous snapshot)" % datetime.now().strftime("%X"))
+
+        for name, fn in sorted(self.__probes.items()):
+            self.__report.append("%s: %s" % (name, fn()))
+
+        for stat in snapshot.compare_to(self.__last, "lineno")[:self.TopStats]:
+            self.__report.append(str(stat))
+
+        self.__report.append("")
+
+        self.__last = snapshot
+
+    async def __take_snapshots__(self):
+        while True:
+            await asyncio.sleep(self.SnapshotInterval)
+
+            self.snapshot()
+
+    def __enter_section__(self, name):
+        if self.__stack:
+            self.__profiles[self.__stack[-1]].disable()
+
+        profile = self.__profiles.get(name)
+
+        if not profile:
+            profile = cProfile.Profile()
+            self.__profiles[name] = profile
+
+        self.__stack.append(name)
+
+        profile.enable()
+
+    def __leave_section__(self, name):
+        if self.__stack and self.__stack[-1] == name:
+            self.__profiles[self.__stack.pop()].disable()
+
+            if self.__stack:
+                self.__profiles[self.__stack[-1]].enable()
+
+profiler = Profiler()
+
+def section(name):
+    return profiler.section(name)
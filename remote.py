@@ -0,0 +1,497 @@
+"""
+    project............: Handgurke
+    description........: ICB client
+    date...............: 06/2019
+    copyright..........: Sebastian Fedrau
+
+    Permission is hereby granted, free of charge, to any person obtaining
+    a copy of this software and associated documentation files (the
+    "Software"), to deal in the Software without restriction, including
+    without limitation the rights to use, copy, modify, merge, publish,
+    distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to
+    the following conditions:
+
+    The above copyright notice and this permission notice shall be
+    included in all copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+    IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+    OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+    ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+    OTHER DEALINGS IN THE SOFTWARE.
+"""
+import asyncio
+from collections import deque
+from datetime import datetime
+import mmap
+import multiprocessing
+import os
+import signal
+import struct
+import client
+import roster
+import scheduler
+import capture
+import chatlog
+import worker
+import stats
+
+MESSAGE = b"m"
+CONNECT = b"c"
+CONNECTED = b"C"
+ERROR = b"e"
+LOST = b"l"
+TIMEOUT = b"t"
+DEAD = b"d"
+RTT = b"r"
+PACKET = b"p"
+RULE = b"u"
+QUIT = b"q"
+
+class Ring:
+    Header = struct.Struct("<QQ")
+    Length = struct.Struct("<I")
+    Wrap = 0xffffffff
+
+    def __init__(self, buffer, offset, size):
+        self.__buffer = buffer
+        self.__offset = offset
+        self.__base = offset + self.Header.size
+        self.__size = size - self.Header.size
+
+    def put(self, data):
+        # only the producer writes head, only the consumer writes tail
+        head, tail = self.Header.unpack_from(self.__buffer, self.__offset)
+        free = self.__size - (head - tail)
+        pos = head % self.__size
+        length = self.Length.size + len(data)
+
+        if pos + length > self.__size:
+            waste = self.__size - pos
+
+            if free < waste + length:
+                return False
+
+            if waste >= self.Length.size:
+                self.Length.pack_into(self.__buffer, self.__base + pos, self.Wrap)
+
+            head += waste
+            pos = 0
+        elif free < length:
+            return False
+
+        self.Length.pack_into(self.__buffer, self.__base + pos, len(data))
+        self.__buffer[self.__base + pos + self.Length.size:self.__base + pos + length] = data
+
+        struct.pack_into("<Q", self.__buffer, self.__offset, head + length)
+
+        return True
+
+    def get(self):
+        head, tail = self.Header.unpack_from(self.__buffer, self.__offset)
+
+        if head == tail:
+            return None
+
+        pos = tail % self.__size
+
+        if self.__size - pos < self.Length.size or self.Length.unpack_from(self.__buffer, self.__base + pos)[0] == self.Wrap:
+            tail += self.__size - pos
+            pos = 0
+
+        length = self.Length.unpack_from(self.__buffer, self.__base + pos)[0]
+        start = self.__base + pos + self.Length.size
+        data = self.__buffer[start:start + length]
+
+        struct.pack_into("<Q", self.__buffer, self.__offset + 8, tail + self.Length.size + length)
+
+        return data
+
+class Channel:
+    Retry = 0.05
+
+    Queued = stats.registry.gauge("handgurke_channel_backlog", "Number of records waiting for free space in the ring buffer.")
+
+    def __init__(self, ring_out, ring_in, fd_out, fd_in):
+        self.__out = ring_out
+        self.__in = ring_in
+        self.__fd_out = fd_out
+        self.__fd_in = fd_in
+        self.__backlog = deque()
+        self.__loop = None
+        self.__on_record = None
+        self.__on_close = None
+        self.__retry = None
+        self.__closed = False
+
+    def open(self, on_record, on_close=None):
+        self.__loop = asyncio.get_event_loop()
+        self.__on_record = on_record
+        self.__on_close = on_close
+
+        os.set_blocking(self.__fd_out, False)
+
+        self.__loop.add_reader(self.__fd_in, self.__readable__)
+
+    def send(self, kind, payload=b""):
+        if self.__closed:
+            raise ConnectionError("Network process terminated.")
+
+        self.__backlog.append(kind + payload)
+
+        self.__flush__()
+
+    def __flush__(self):
+        self.__retry = None
+
+        if self.__closed:
+            return
+
+        sent = False
+
+        while self.__backlog and self.__out.put(self.__backlog[0]):
+            self.__backlog.popleft()
+
+            sent = True
+
+        if sent:
+            try:
+                os.write(self.__fd_out, b"\0")
+            except (BlockingIOError, BrokenPipeError): pass
+
+        if self.__backlog and not self.__retry:
+            self.__retry = self.__loop.call_later(self.Retry, self.__flush__)
+
+        self.Queued.set(len(self.__backlog))
+
+    def __readable__(self):
+        try:
+            closed = not os.read(self.__fd_in, 4096)
+        except BlockingIOError:
+            closed = False
+
+        record = self.__in.get()
+
+        while record is not None:
+            self.__on_record(record[:1], record[1:])
+
+            record = self.__in.get()
+
+        if closed:
+            self.close()
+
+            if self.__on_close:
+                self.__on_close()
+
+    def close(self):
+        if not self.__closed:
+            self.__closed = True
+
+            if self.__retry:
+                self.__retry.cancel()
+                self.__retry = None
+
+            self.__backlog.clear()
+
+            if self.__loop:
+                self.__loop.remove_reader(self.__fd_in)
+
+            os.close(self.__fd_in)
+            os.close(self.__fd_out)
+
+def encode_message(message_type, fields):
+    return ("%s%s" % (message_type, "\x01".join(fields))).encode("UTF-8")
+
+def decode_message(message_type, payload):
+    return message_type, bytes(payload).decode("UTF-8").split("\x01")
+
+class Network:
+    def __init__(self, channel, opts, rules=None):
+        self.__channel = channel
+        self.__opts = opts
+        self.__rules = rules
+        self.__roster = roster.Roster()
+        self.__timers = scheduler.Scheduler()
+        self.__capture = capture.Writer(opts["capture"]) if opts["capture"] else None
+        self.__pool = worker.Pool(workers=1)
+        self.__log = chatlog.Log(opts["log"], self.__pool, report=lambda text: self.__send__(MESSAGE, encode_message("e", [text]))) if opts["log"] else None
+        self.__client = client.Client(opts["server"],
+                                      opts["port"],
+                                      use_ssl=opts["ssl"],
+                                      verify_cert=opts["verify_cert"],
+                                      max_missed_pongs=opts["max_missed_pongs"],
+                                      scheduler=self.__timers,
+                                      filters=rules,
+                                      capture_writer=self.__capture)
+        self.__done = asyncio.get_event_loop().create_future()
+
+    async def run(self):
+        self.__channel.open(self.__request__, self.__quit__)
+
+        if self.__opts["keepalive"] > 0:
+            self.__timers.call_every(self.__opts["keepalive"], self.__keepalive__)
+
+        read_f = asyncio.ensure_future(self.__read__())
+
+        await self.__done
+
+        read_f.cancel()
+
+        if self.__capture:
+            self.__capture.close()
+
+        if self.__log:
+            self.__log.close()
+
+        self.__pool.shutdown()
+
+    async def __read__(self):
+        while True:
+            msg = await self.__client.read()
+
+            if msg:
+                message_type, fields = msg
+
+                if message_type == "l":
+                    self.__client.pong()
+                elif message_type != "m":
+                    self.__send__(MESSAGE, encode_message(message_type, fields))
+
+                    if self.__log and self.__displayed__(message_type, fields):
+                        self.__log.append(datetime.now(), message_type, fields)
+            else:
+                self.__send__(TIMEOUT)
+
+    def __displayed__(self, message_type, fields):
+        # the log has the messages the UI displays, the roster tells which listings are requested by the UI
+        if not message_type in "bcdefki":
+            return False
+
+        group = self.__roster.group
+        displayed = self.__roster.update(message_type, fields)
+
+        if self.__roster.group != group:
+            self.__roster.expect_listing()
+
+        return displayed and (not self.__rules or self.__rules.apply(message_type, fields) is not None)
+
+    def __keepalive__(self):
+        if not self.__client.keepalive():
+            self.__send__(DEAD)
+
+        rtt = self.__client.rtt
+
+        self.__send__(RTT, (str(rtt) if rtt is not None else "").encode())
+
+    def __request__(self, kind, payload):
+        if kind == CONNECT:
+            asyncio.ensure_future(self.__connect__())
+        elif kind == PACKET:
+            try:
+                self.__client.write(payload)
+            except Exception as e:
+                self.__send__(ERROR, str(e).encode("UTF-8"))
+        elif kind == RULE:
+            command, value = payload.decode("UTF-8").split("\x01", 1)
+
+            if self.__rules:
+                self.__rules.toggle(command, value)
+        elif kind == QUIT:
+            self.__quit__()
+
+    async def __connect__(self):
+        if self.__client.connected:
+            self.__client.quit()
+
+        try:
+            on_conn_lost = await self.__client.connect()
+
+            on_conn_lost.add_done_callback(lambda f: self.__send__(LOST))
+
+            self.__send__(CONNECTED)
+        except Exception as e:
+            self.__send__(ERROR, str(e).encode("UTF-8"))
+
+    def __send__(self, kind, payload=b""):
+        # the UI process may be gone already
+        try:
+            self.__channel.send(kind, payload)
+        except ConnectionError: pass
+
+    def __quit__(self):
+        if self.__client.connected:
+            self.__client.quit()
+
+        if not self.__done.done():
+            self.__done.set_result(None)
+
+def serve(channel, opts, fds, rules=None):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # close the parent's ends, so a terminated UI process is noticed
+    for fd in fds:
+        os.close(fd)
+
+    loop = asyncio.new_event_loop()
+
+    asyncio.set_event_loop(loop)
+
+    try:
+        loop.run_until_complete(Network(channel, opts, rules).run())
+    finally:
+        loop.close()
+
+class RemoteClient(client.Client):
+    def __init__(self, channel, process, filters=None):
+        super().__init__(None, None, filters=filters)
+
+        self.__channel = channel
+        self.__process = process
+        self.__queue = client.Inbox()
+        self.__reply = None
+        self.__on_conn_lost = None
+        self.__connected = False
+        self.__dead = False
+        self.__rtt = None
+
+        channel.open(self.__record__, self.__closed__)
+
+    async def connect(self):
+        loop = asyncio.get_event_loop()
+
+        self.__reply = loop.create_future()
+        self.__on_conn_lost = loop.create_future()
+
+        self.__channel.send(CONNECT)
+
+        error = await self.__reply
+
+        if error is not None:
+            raise ConnectionError(error)
+
+        self.__connected = True
+
+        return self.__on_conn_lost
+
+    def __record__(self, kind, payload):
+        if kind == MESSAGE:
+            # decoded when read, the lanes only look at the raw fields
+            self.__queue.put_nowait((chr(payload[0]), payload[1:]))
+        elif kind == CONNECTED:
+            self.__resolve__(None)
+        elif kind == ERROR:
+            if not self.__resolve__(payload.decode("UTF-8")):
+                self.__queue.put_nowait(("e", payload))
+        elif kind == LOST:
+            self.__lost__()
+        elif kind == TIMEOUT:
+            self.__queue.put_nowait(None)
+        elif kind == DEAD:
+            self.__dead = True
+        elif kind == RTT:
+            self.__rtt = float(payload) if payload else None
+
+    def __resolve__(self, error):
+        resolved = False
+
+        if self.__reply and not self.__reply.done():
+            self.__reply.set_result(error)
+
+            resolved = True
+
+        return resolved
+
+    def __lost__(self):
+        self.__connected = False
+
+        if self.__on_conn_lost and not self.__on_conn_lost.done():
+            self.__on_conn_lost.set_result(0)
+
+    def __closed__(self):
+        self.__resolve__("Network process terminated.")
+        self.__lost__()
+
+    async def read(self):
+        msg = await self.__queue.get()
+
+        while self.__ignored__(msg):
+            msg = await self.__queue.get()
+
+        return decode_message(*msg) if msg else None
+
+    def read_nowait(self):
+        msg = self.__queue.get_nowait()
+
+        while self.__ignored__(msg):
+            msg = self.__queue.get_nowait()
+
+        return decode_message(*msg) if msg else None
+
+    @property
+    def pending(self):
+        return self.__queue.qsize()
+
+    @property
+    def connected(self):
+        return self.__connected
+
+    @property
+    def rtt(self):
+        return self.__rtt
+
+    @property
+    def jitter(self):
+        return None
+
+    def keepalive(self):
+        # pings are sent and answered by the network process
+        alive = not self.__dead
+
+        self.__dead = False
+
+        return alive
+
+    def pong(self):
+        pass
+
+    def __write__(self, pkg):
+        self.__channel.send(PACKET, bytes(pkg))
+
+    async def drain(self):
+        pass
+
+    def toggle_rule(self, command, value):
+        self.__channel.send(RULE, ("%s\x01%s" % (command, value)).encode("UTF-8"))
+
+    def quit(self):
+        try:
+            self.__channel.send(QUIT)
+        except ConnectionError: pass
+
+    def shutdown(self):
+        self.quit()
+        self.__process.join(2.0)
+
+        if self.__process.is_alive():
+            self.__process.terminate()
+
+        self.__channel.close()
+
+def start(opts, filters=None, size=1 << 20):
+    buffer = mmap.mmap(-1, size * 2)
+
+    up_r, up_w = os.pipe()
+    down_r, down_w = os.pipe()
+
+    context = multiprocessing.get_context("fork")
+
+    process = context.Process(target=serve, args=(Channel(Ring(buffer, 0, size), Ring(buffer, size, size), down_w, up_r), opts, (up_w, down_r), filters), daemon=True)
+    process.start()
+
+    os.close(up_r)
+    os.close(down_w)
+
+    return RemoteClient(Channel(Ring(buffer, size, size), Ring(buffer, 0, size), up_w, down_r), process, filters)
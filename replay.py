@@ -0,0 +1,137 @@
+"""
+    project............: Handgurke
+    description........: ICB client
+    date...............: 06/2019
+    copyright..........: Sebastian Fedrau
+
+    Permission is hereby granted, free of charge, to any person obtaining
+    a copy of this software and associated documentation files (the
+    "Software"), to deal in the Software without restriction, including
+    without limitation the rights to use, copy, modify, merge, publish,
+    distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to
+    the following conditions:
+
+    The above copyright notice and this permission notice shall be
+    included in all copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+    IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+    OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+    ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+    OTHER DEALINGS IN THE SOFTWARE.
+"""
+import asyncio
+import getopt
+import sys
+import ui
+import window
+import client
+import timer
+import stats
+import roster
+import completion
+import scheduler
+import capture
+import collapse
+import handgurke
+
+def get_opts(argv):
+    options, args = getopt.getopt(argv, 'fl:c:', ["fast", "lines=", "cols="])
+
+    m = {"fast": False, "lines": 24, "cols": 80}
+
+    for opt, arg in options:
+        if opt in ('-f', '--fast'):
+            m["fast"] = True
+        elif opt in ('-l', '--lines'):
+            m["lines"] = int(arg)
+        elif opt in ('-c', '--cols'):
+            m["cols"] = int(arg)
+
+    if len(args) != 1:
+        raise getopt.GetoptError("Usage: replay.py [--fast] [--lines LINES] [--cols COLUMNS] FILE")
+
+    m["filename"] = args[0]
+
+    return m
+
+async def feed(protocol, transport, filename, fast):
+    delay = 0.0
+
+    for direction, delta, data in capture.read(filename):
+        delay += delta
+
+        if direction == capture.INBOUND:
+            if fast:
+                await asyncio.sleep(0)
+            elif delay > 0:
+                await asyncio.sleep(delay)
+
+            delay = 0.0
+
+            protocol.data_received(data)
+
+    transport.close()
+
+async def run():
+    opts = get_opts(sys.argv[1:])
+
+    icb_client = client.Client("replay", 0, scheduler=scheduler.Scheduler())
+    transport = capture.ReplayTransport()
+    # replayed data can be slower than the server, so no receive timeout
+    protocol, on_conn_lost = icb_client.attach(transport, timeout=None)
+
+    transport.attach(protocol)
+
+    screen = ui.Headless(opts["lines"], opts["cols"])
+    model = window.ViewModel()
+    group_roster = roster.Roster()
+    completer = completion.Completer()
+    collapser = collapse.Collapser(model)
+    dispatcher = handgurke.Dispatcher(model, icb_client, completer, group_roster, "", collapser=collapser)
+
+    w = window.Window(screen.stdscr, model, completer, backend=screen)
+
+    feed_f = asyncio.ensure_future(feed(protocol, transport, opts["filename"], opts["fast"]))
+    client_f = asyncio.ensure_future(icb_client.read())
+
+    elapsed = timer.Timer()
+    count = 0
+
+    while True:
+        w.refresh()
+
+        done, _ = await asyncio.wait([client_f, on_conn_lost], return_when=asyncio.FIRST_COMPLETED)
+
+        if client_f in done:
+            count += dispatcher.dispatch(client_f.result())
+
+            client_f = asyncio.ensure_future(icb_client.read())
+        elif not icb_client.pending:
+            break
+
+    client_f.cancel()
+
+    if feed_f.done():
+        if not feed_f.cancelled():
+            feed_f.result()
+    else:
+        feed_f.cancel()
+
+    seconds = elapsed.elapsed()
+
+    print("%d messages in %.3fs (%.0f messages/s)" % (count, seconds, count / seconds if seconds else 0))
+    print("%d cells written, %d screen updates" % (screen.cells, screen.updates))
+
+    for l in stats.registry.summary():
+        print(l)
+
+if __name__ == "__main__":
+    try:
+        asyncio.get_event_loop().run_until_complete(run())
+    except getopt.GetoptError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
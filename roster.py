@@ -0,0 +1,233 @@
+"""
+    project............: Handgurke
+    description........: ICB client
+    date...............: 06/2019
+    copyright..........: Sebastian Fedrau
+
+    Permission is hereby granted, free of charge, to any person obtaining
+    a copy of this software and associated documentation files (the
+    "Software"), to deal in the Software without restriction, including
+    without limitation the rights to use, copy, modify, merge, publish,
+    distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to
+    the following conditions:
+
+    The above copyright notice and this permission notice shall be
+    included in all copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+    IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+    OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+    ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+    OTHER DEALINGS IN THE SOFTWARE.
+"""
+import re
+import time
+from bisect import bisect_left, insort
+
+class Entry:
+    __slots__ = ["nick", "moderator", "idle", "login", "user", "host", "status", "seen"]
+
+    def __init__(self, nick, moderator=False, idle=0, login=0, user="", host="", status="", seen=0):
+        self.nick = nick
+        self.moderator = moderator
+        self.idle = idle
+        self.login = login
+        self.user = user
+        self.host = host
+        self.status = status
+        self.seen = seen
+
+    def idle_at(self, now):
+        return self.idle + max(0, int(now - self.seen))
+
+    def fields(self, now):
+        return ["wl",
+                "m" if self.moderator else "",
+                self.nick,
+                str(self.idle_at(now)),
+                "0",
+                str(self.login),
+                self.user,
+                self.host,
+                self.status]
+
+class Group:
+    def __init__(self, name):
+        self.name = name
+        self.moderator = ""
+        self.topic = None
+        self.__members = {}
+        self.__order = []
+
+    def __len__(self):
+        return len(self.__order)
+
+    def __contains__(self, nick):
+        return nick.lower() in self.__members
+
+    def get(self, nick):
+        return self.__members.get(nick.lower())
+
+    def add(self, entry):
+        key = entry.nick.lower()
+
+        if not key in self.__members:
+            insort(self.__order, key)
+
+        self.__members[key] = entry
+
+    def remove(self, nick):
+        key = nick.lower()
+
+        if self.__members.pop(key, None):
+            del self.__order[bisect_left(self.__order, key)]
+
+    def clear(self):
+        self.__members = {}
+        self.__order = []
+
+    def page(self, index, size):
+        return [self.__members[k] for k in self.__order[index * size:(index + 1) * size]]
+
+class Roster:
+    PageSize = 50
+
+    def __init__(self):
+        self.__groups = {}
+        self.__group = ""
+        self.__listing = None
+        self.__quiet = False
+
+    @property
+    def group(self):
+        return self.__group
+
+    def get(self, name):
+        return self.__groups.get(name.lower())
+
+    def __getitem__(self, name):
+        key = name.lower()
+        group = self.__groups.get(key)
+
+        if not group:
+            group = Group(name)
+            self.__groups[key] = group
+
+        return group
+
+    def expect_listing(self):
+        self.__quiet = True
+
+    def update(self, message_type, fields, now=None):
+        now = time.time() if now is None else now
+        visible = True
+
+        if message_type == "b":
+            entry = self[self.__group].get(fields[0])
+
+            if entry:
+                entry.idle = 0
+                entry.seen = now
+        elif message_type == "d":
+            self.__update_status__(fields[0], fields[1], now)
+        elif message_type == "i":
+            if fields[0] == "co":
+                m = re.match(r"^Group: (\S+)(?:.*Mod: (\S+))?(?:.*Topic: (.*))?", fields[1])
+
+                if m:
+                    self.__commit_listing__()
+
+                    # members are collected in a new group, the cached one is kept until the listing is complete
+                    cached = self[m.group(1)]
+
+                    self.__listing = Group(cached.name)
+                    self.__listing.moderator = cached.moderator
+                    self.__listing.topic = cached.topic
+
+                    if m.group(2):
+                        self.__listing.moderator = m.group(2) if m.group(2) != "(None)" else ""
+
+                    if m.group(3) is not None:
+                        self.__listing.topic = m.group(3) if m.group(3) != "(None)" else ""
+
+                    visible = not self.__quiet
+                elif fields[1].startswith("Total: "):
+                    self.__commit_listing__()
+
+                    visible = not self.__quiet
+
+                    self.__quiet = False
+                elif fields[1].startswith("The topic is: "):
+                    topic = fields[1][14:]
+
+                    self[self.__group].topic = topic if topic != "(None)" else ""
+            elif fields[0] in ["wl", "wh"]:
+                if fields[0] == "wl":
+                    group = self.__listing if self.__listing else self[self.__group]
+
+                    group.add(Entry(fields[2],
+                                    moderator=bool(fields[1].strip()),
+                                    idle=int(fields[3]),
+                                    login=int(fields[5]),
+                                    user=fields[6],
+                                    host=fields[7],
+                                    status=fields[8] if len(fields) > 8 else "",
+                                    seen=now))
+
+                visible = not self.__quiet
+
+        return visible
+
+    def __commit_listing__(self):
+        if self.__listing:
+            self.__groups[self.__listing.name.lower()] = self.__listing
+            self.__listing = None
+
+    def __update_status__(self, category, text, now):
+        if category == "Status":
+            m = re.match(r"^You are now in group ([^\s]+)", text)
+
+            if m:
+                self.__group = m.group(1)
+        elif category in ["Sign-on", "Arrive"]:
+            m = re.match(r"^(\S+) \((\S+)@(\S+)\)", text)
+
+            if m:
+                self[self.__group].add(Entry(m.group(1), login=int(now), user=m.group(2), host=m.group(3), seen=now))
+        elif category in ["Sign-off", "Depart"]:
+            m = re.match(r"^(\S+) ", text)
+
+            if m:
+                self[self.__group].remove(m.group(1))
+        elif category == "Name":
+            m = re.match(r"^(\S+) changed nickname to (\S+)", text)
+
+            if m:
+                for group in self.__groups.values():
+                    entry = group.get(m.group(1))
+
+                    if entry:
+                        group.remove(entry.nick)
+                        entry.nick = m.group(2)
+                        group.add(entry)
+        elif category == "Topic":
+            m = re.match(r"^\S+ changed the topic to \"(.*)\"", text)
+
+            if m:
+                self[self.__group].topic = m.group(1) if m.group(1) != "(None)" else ""
+        elif category == "Pass":
+            m = re.match(r".* has passed moderation to (\S+)", text)
+
+            if m:
+                self[self.__group].moderator = m.group(1)
+
+    def page(self, index, now=None, name=None):
+        now = time.time() if now is None else now
+        group = self[name if name else self.__group]
+        pages = max(1, (len(group) + self.PageSize - 1) // self.PageSize)
+        index = min(max(0, index), pages - 1)
+
+        return [e.fields(now) for e in group.page(index, self.PageSize)], index, pages
@@ -0,0 +1,194 @@
+"""
+    project............: Handgurke
+    description........: ICB client
+    date...............: 06/2019
+    copyright..........: Sebastian Fedrau
+
+    Permission is hereby granted, free of charge, to any person obtaining
+    a copy of this software and associated documentation files (the
+    "Software"), to deal in the Software without restriction, including
+    without limitation the rights to use, copy, modify, merge, publish,
+    distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to
+    the following conditions:
+
+    The above copyright notice and this permission notice shall be
+    included in all copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+    IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+    OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+    ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+    OTHER DEALINGS IN THE SOFTWARE.
+"""
+import asyncio
+import math
+import stats
+
+class Timer:
+    __slots__ = ["scheduler", "deadline", "interval", "callback", "args", "tick", "active"]
+
+    def __init__(self, scheduler, deadline, interval, callback, args):
+        self.scheduler = scheduler
+        self.deadline = deadline
+        self.interval = interval
+        self.callback = callback
+        self.args = args
+        self.tick = 0
+        self.active = True
+
+    def cancel(self):
+        self.active = False
+
+    def reset(self, delay):
+        self.scheduler.__reset__(self, delay)
+
+class Scheduler:
+    Resolution = 0.1
+    Slots = 512
+
+    Wakeups = stats.registry.counter("handgurke_scheduler_wakeups_total", "Number of timer wheel wakeups.")
+    Timers = stats.registry.gauge("handgurke_scheduler_timers", "Number of timers in the timer wheel.")
+
+    def __init__(self, loop=None):
+        self.__loop = loop if loop else asyncio.get_event_loop()
+        self.__wheel = [[] for _ in range(self.Slots)]
+        self.__tick = math.floor(self.__loop.time() / self.Resolution)
+        self.__count = 0
+        self.__handle = None
+        self.__armed = None
+        self.__running = False
+
+    def time(self):
+        return self.__loop.time()
+
+    def call_later(self, delay, callback, *args):
+        timer = Timer(self, self.__loop.time() + delay, None, callback, args)
+
+        self.__insert__(timer)
+
+        return timer
+
+    def call_every(self, interval, callback, *args):
+        timer = Timer(self, self.__loop.time() + interval, interval, callback, args)
+
+        self.__insert__(timer)
+
+        return timer
+
+    def sleep(self, delay):
+        future = self.__loop.create_future()
+
+        self.call_later(delay, self.__wake__, future)
+
+        return future
+
+    @staticmethod
+    def __wake__(future):
+        if not future.done():
+            future.set_result(None)
+
+    def __reset__(self, timer, delay):
+        deadline = self.__loop.time() + delay
+
+        if timer.active and deadline >= timer.deadline:
+            # the timer is moved to its new slot when the old one expires
+            timer.deadline = deadline
+        else:
+            timer.deadline = deadline
+            timer.active = True
+
+            self.__insert__(timer)
+
+    def __insert__(self, timer):
+        tick = max(math.ceil(timer.deadline / self.Resolution), self.__tick + 1)
+
+        timer.tick = tick
+
+        self.__wheel[tick % self.Slots].append((tick, timer))
+        self.__count += 1
+
+        self.Timers.set(self.__count)
+
+        if not self.__running and (self.__armed is None or tick < self.__armed):
+            self.__arm__(tick)
+
+    def __arm__(self, tick):
+        if self.__handle:
+            self.__handle.cancel()
+
+        self.__armed = tick
+        self.__handle = self.__loop.call_at(tick * self.Resolution, self.__run__)
+
+    def __run__(self):
+        self.Wakeups.inc()
+
+        now = self.__loop.time()
+        now_tick = max(math.floor(now / self.Resolution), self.__armed)
+
+        self.__handle = None
+        self.__armed = None
+        self.__running = True
+
+        due = []
+
+        for t in range(self.__tick + 1, min(now_tick, self.__tick + self.Slots) + 1):
+            index = t % self.Slots
+            pending = []
+
+            for entry in self.__wheel[index]:
+                tick, timer = entry
+
+                if tick > now_tick:
+                    pending.append(entry)
+                else:
+                    self.__count -= 1
+
+                    if timer.active and timer.tick == tick:
+                        timer.tick = None
+                        due.append(timer)
+
+            self.__wheel[index] = pending
+
+        self.__tick = now_tick
+
+        try:
+            for timer in due:
+                if timer.deadline > now + self.Resolution:
+                    self.__insert__(timer)
+                else:
+                    if timer.interval:
+                        timer.deadline = max(timer.deadline + timer.interval, now)
+                        self.__insert__(timer)
+                    else:
+                        timer.active = False
+
+                    timer.callback(*timer.args)
+        finally:
+            self.__running = False
+
+            self.Timers.set(self.__count)
+            self.__rearm__()
+
+    def __rearm__(self):
+        if not self.__count:
+            return
+
+        for t in range(self.__tick + 1, self.__tick + self.Slots + 1):
+            for tick, timer in self.__wheel[t % self.Slots]:
+                if tick == t and timer.active and timer.tick == tick:
+                    self.__arm__(t)
+
+                    return
+
+        ticks = [tick for slot in self.__wheel for tick, timer in slot if timer.active and timer.tick == tick]
+
+        if ticks:
+            self.__arm__(min(ticks))
+        else:
+            # only stale entries left, drop them
+            self.__wheel = [[] for _ in range(self.Slots)]
+            self.__count = 0
+            self.Timers.set(0)
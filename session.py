@@ -0,0 +1,176 @@
+"""
+    project............: Handgurke
+    description........: ICB client
+    date...............: 06/2019
+    copyright..........: Sebastian Fedrau
+
+    Permission is hereby granted, free of charge, to any person obtaining
+    a copy of this software and associated documentation files (the
+    "Software"), to deal in the Software without restriction, including
+    without limitation the rights to use, copy, modify, merge, publish,
+    distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to
+    the following conditions:
+
+    The above copyright notice and this permission notice shall be
+    included in all copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+    IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+    OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+    ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+    OTHER DEALINGS IN THE SOFTWARE.
+"""
+import asyncio
+from collections import namedtuple
+import client
+import ltd
+import scheduler
+
+Login = namedtuple("Login", [])
+Open = namedtuple("Open", ["nick", "text"])
+Personal = namedtuple("Personal", ["nick", "text"])
+Status = namedtuple("Status", ["category", "text"])
+Important = namedtuple("Important", ["category", "text"])
+Error = namedtuple("Error", ["text"])
+Beep = namedtuple("Beep", ["nick"])
+Output = namedtuple("Output", ["text"])
+WhoEntry = namedtuple("WhoEntry", ["moderator", "nick", "idle", "login", "user", "host", "status"])
+Packet = namedtuple("Packet", ["type", "fields"])
+
+def who_entry(fields):
+    return WhoEntry(bool(fields[1].strip()), fields[2], int(fields[3]), int(fields[5]), fields[6], fields[7], fields[8])
+
+def output(fields):
+    if fields[0] == "co":
+        msg = Output(fields[1])
+    elif fields[0] == "wl":
+        msg = who_entry(fields)
+    else:
+        msg = Packet("i", fields)
+
+    return msg
+
+CONVERTERS = {"a": lambda f: Login(),
+              "b": lambda f: Open(f[0], f[1]),
+              "c": lambda f: Personal(f[0], f[1]),
+              "d": lambda f: Status(f[0], f[1]),
+              "e": lambda f: Error(f[0]),
+              "f": lambda f: Important(f[0], f[1]),
+              "i": output,
+              "k": lambda f: Beep(f[0])}
+
+def convert(message_type, fields):
+    try:
+        return CONVERTERS[message_type](fields)
+    except (KeyError, IndexError, ValueError):
+        return Packet(message_type, fields)
+
+class Session:
+    def __init__(self, host, port, use_ssl=False, verify_cert=False, keepalive=10.0, max_missed_pongs=3, filters=None):
+        self.__scheduler = scheduler.Scheduler()
+        self.__client = client.Client(host,
+                                      port,
+                                      use_ssl=use_ssl,
+                                      verify_cert=verify_cert,
+                                      max_missed_pongs=max_missed_pongs,
+                                      scheduler=self.__scheduler,
+                                      filters=filters)
+        self.__keepalive = keepalive
+        self.__keepalive_timer = None
+        self.__on_conn_lost = None
+
+    @property
+    def connected(self):
+        return self.__client.connected
+
+    @property
+    def rtt(self):
+        return self.__client.rtt
+
+    async def connect(self, loginid, nick, group="", password=""):
+        self.__on_conn_lost = await self.__client.connect()
+
+        self.__client.login(loginid, nick, group, password)
+
+        if self.__keepalive:
+            self.__keepalive_timer = self.__scheduler.call_every(self.__keepalive, self.__client.keepalive)
+
+        await self.__client.drain()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            msg = await self.__read__()
+
+            if not msg:
+                self.close()
+
+                raise StopAsyncIteration
+
+            message_type, fields = msg
+
+            if message_type == "l":
+                self.__client.pong()
+            elif message_type != "m":
+                return convert(message_type, fields)
+
+    async def __read__(self):
+        msg = self.__read_nowait__()
+
+        if msg is False and self.__on_conn_lost and not self.__on_conn_lost.done():
+            read_f = asyncio.ensure_future(self.__client.read())
+
+            await asyncio.wait([read_f, self.__on_conn_lost], return_when=asyncio.FIRST_COMPLETED)
+
+            if read_f.done():
+                return read_f.result()
+
+            read_f.cancel()
+
+            # deliver packets received before the connection was lost
+            msg = self.__read_nowait__()
+
+        return msg if msg is not False else None
+
+    def __read_nowait__(self):
+        # skips ignored nicks without waiting, False if nothing is queued
+        try:
+            return self.__client.read_nowait()
+        except asyncio.QueueEmpty:
+            return False
+
+    async def send(self, text):
+        for chunk in ltd.split_text(text, self.__client.message_limit()):
+            self.__client.open_message(chunk)
+
+            await self.__client.drain()
+
+    async def private(self, nick, text):
+        for chunk in ltd.split_text(text, self.__client.message_limit(nick)):
+            self.__client.private_message(nick, chunk)
+
+            await self.__client.drain()
+
+    async def command(self, command, arg=""):
+        self.__client.command(command, arg)
+
+        await self.__client.drain()
+
+    def close(self):
+        if self.__keepalive_timer:
+            self.__keepalive_timer.cancel()
+            self.__keepalive_timer = None
+
+        if self.__client.connected:
+            self.__client.quit()
@@ -0,0 +1,243 @@
+"""
+    project............: Handgurke
+    description........: ICB client
+    date...............: 06/2019
+    copyright..........: Sebastian Fedrau
+
+    Permission is hereby granted, free of charge, to any person obtaining
+    a copy of this software and associated documentation files (the
+    "Software"), to deal in the Software without restriction, including
+    without limitation the rights to use, copy, modify, merge, publish,
+    distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to
+    the following conditions:
+
+    The above copyright notice and this permission notice shall be
+    included in all copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+    IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+    OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+    ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+    OTHER DEALINGS IN THE SOFTWARE.
+"""
+import asyncio
+import json
+import os
+import stat
+from bisect import bisect_left
+
+class Counter:
+    def __init__(self, name, description, label=None):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.__values = {}
+
+    @property
+    def kind(self):
+        return "counter"
+
+    def inc(self, amount=1, label_value=""):
+        self.__values[label_value] = self.__values.get(label_value, 0) + amount
+
+    @property
+    def values(self):
+        return self.__values
+
+    @property
+    def total(self):
+        return sum(self.__values.values())
+
+class Gauge(Counter):
+    @property
+    def kind(self):
+        return "gauge"
+
+    def set(self, value, label_value=""):
+        self.values[label_value] = value
+
+class Histogram:
+    Buckets = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+    def __init__(self, name, description, buckets=None):
+        self.name = name
+        self.description = description
+        self.__buckets = buckets if buckets else self.Buckets
+        self.__counts = [0] * (len(self.__buckets) + 1)
+        self.__sum = 0.0
+        self.__max = 0.0
+
+    @property
+    def kind(self):
+        return "histogram"
+
+    def observe(self, value):
+        self.__counts[bisect_left(self.__buckets, value)] += 1
+        self.__sum += value
+
+        if value > self.__max:
+            self.__max = value
+
+    @property
+    def count(self):
+        return sum(self.__counts)
+
+    @property
+    def sum(self):
+        return self.__sum
+
+    @property
+    def max(self):
+        return self.__max
+
+    @property
+    def buckets(self):
+        cumulative = 0
+
+        for le, count in zip(self.__buckets + (float("inf"),), self.__counts):
+            cumulative += count
+
+            yield le, cumulative
+
+class Registry:
+    def __init__(self):
+        self.__metrics = {}
+
+    def counter(self, name, description, label=None):
+        return self.__register__(Counter, name, description, label)
+
+    def gauge(self, name, description, label=None):
+        return self.__register__(Gauge, name, description, label)
+
+    def histogram(self, name, description, buckets=None):
+        return self.__register__(Histogram, name, description, buckets)
+
+    def __register__(self, cls, name, description, arg):
+        metric = self.__metrics.get(name)
+
+        if not metric:
+            metric = cls(name, description, arg)
+            self.__metrics[name] = metric
+
+        return metric
+
+    def __iter__(self):
+        return iter(sorted(self.__metrics.values(), key=lambda m: m.name))
+
+    def prometheus(self):
+        lines = []
+
+        for m in self:
+            lines.append("# HELP %s %s" % (m.name, m.description))
+            lines.append("# TYPE %s %s" % (m.name, m.kind))
+
+            if isinstance(m, Histogram):
+                for le, count in m.buckets:
+                    lines.append("%s_bucket{le=\"%s\"} %d" % (m.name, "+Inf" if le == float("inf") else repr(le), count))
+
+                lines.append("%s_sum %f" % (m.name, m.sum))
+                lines.append("%s_count %d" % (m.name, m.count))
+            elif m.label:
+                for k, v in sorted(m.values.items()):
+                    lines.append("%s{%s=\"%s\"} %s" % (m.name, m.label, k, v))
+            else:
+                lines.append("%s %s" % (m.name, m.values.get("", 0)))
+
+        return "\n".join(lines) + "\n"
+
+    def json(self):
+        d = {}
+
+        for m in self:
+            if isinstance(m, Histogram):
+                d[m.name] = {"count": m.count, "sum": m.sum, "max": m.max}
+            elif m.label:
+                d[m.name] = dict(m.values)
+            else:
+                d[m.name] = m.values.get("", 0)
+
+        return json.dumps(d, sort_keys=True) + "\n"
+
+    def summary(self):
+        lines = []
+
+        for m in self:
+            if isinstance(m, Histogram):
+                count = m.count
+                avg = (m.sum / count) if count else 0.0
+
+                if m.name.endswith("_seconds"):
+                    lines.append("%-40s n=%d avg=%.3fms max=%.3fms" % (m.name, count, avg * 1000.0, m.max * 1000.0))
+                else:
+                    lines.append("%-40s n=%d avg=%.1f max=%d" % (m.name, count, avg, m.max))
+            elif m.label:
+                values = " ".join("%s=%s" % (k, v) for k, v in sorted(m.values.items()))
+
+                lines.append("%-40s %s" % (m.name, values if values else "-"))
+            else:
+                lines.append("%-40s %s" % (m.name, m.values.get("", 0)))
+
+        return lines
+
+registry = Registry()
+
+class Exporter:
+    def __init__(self, path, registry=registry):
+        self.__path = path
+        self.__registry = registry
+        self.__server = None
+
+    async def start(self):
+        try:
+            mode = os.stat(self.__path).st_mode
+        except FileNotFoundError:
+            mode = None
+
+        if mode is not None:
+            # a stale socket of a previous run, anything else is left alone
+            if not stat.S_ISSOCK(mode):
+                raise FileExistsError("%s exists and is not a socket." % self.__path)
+
+            os.unlink(self.__path)
+
+        self.__server = await asyncio.start_unix_server(self.__handle__, path=self.__path)
+
+    def close(self):
+        if self.__server:
+            self.__server.close()
+            self.__server = None
+
+            try:
+                os.unlink(self.__path)
+            except: pass
+
+    async def __handle__(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=1.0)
+            request = request.decode("ascii", "ignore").strip()
+
+            if request.startswith("GET "):
+                parts = request.split(" ")
+                path = parts[1] if len(parts) > 1 else "/"
+
+                if path.endswith(".json"):
+                    body, content_type = self.__registry.json(), "application/json"
+                else:
+                    body, content_type = self.__registry.prometheus(), "text/plain; version=0.0.4"
+
+                body = body.encode("UTF-8")
+
+                writer.write(("HTTP/1.0 200 OK\r\nContent-Type: %s\r\nContent-Length: %d\r\n\r\n" % (content_type, len(body))).encode("ascii"))
+                writer.write(body)
+            elif request == "json":
+                writer.write(self.__registry.json().encode("UTF-8"))
+            else:
+                writer.write(self.__registry.prometheus().encode("UTF-8"))
+
+            await writer.drain()
+        except: pass
+        finally:
+            writer.close()
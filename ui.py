@@ -37,6 +37,7 @@ COLORS_STATUS = 7
 COLORS_ERROR = 8
 COLORS_IMPORTANT = 9
 COLORS_OUTPUT = 10
+COLORS_HIGHLIGHT = 11
 
 class Ui:
     def __init__(self, mouse=False):
@@ -62,6 +63,7 @@ class Ui:
         curses.init_pair(COLORS_ERROR, curses.COLOR_WHITE, curses.COLOR_RED)
         curses.init_pair(COLORS_IMPORTANT, curses.COLOR_WHITE, curses.COLOR_BLUE)
         curses.init_pair(COLORS_OUTPUT, curses.COLOR_YELLOW, curses.COLOR_BLACK)
+        curses.init_pair(COLORS_HIGHLIGHT, curses.COLOR_BLACK, curses.COLOR_YELLOW)
 
         if not self.__mouse:
             curses.mousemask(curses.ALL_MOUSE_EVENTS)
@@ -74,6 +76,57 @@ class Ui:
 
         curses.endwin()
 
+class HeadlessWindow:
+    def __init__(self, screen, lines, cols):
+        self.__screen = screen
+        self.__lines = lines
+        self.__cols = cols
+
+    def getmaxyx(self):
+        return self.__lines, self.__cols
+
+    def resize(self, lines, cols):
+        self.__lines = lines
+        self.__cols = cols
+
+    def addstr(self, *args):
+        text = args[2] if isinstance(args[0], int) else args[0]
+
+        self.__screen.cells += len(text)
+
+    def bkgd(self, *args): pass
+
+    def move(self, y, x): pass
+
+    def clrtoeol(self): pass
+
+    def clrtobot(self): pass
+
+    def clear(self): pass
+
+    def refresh(self, *args): pass
+
+    def noutrefresh(self, *args): pass
+
+class Headless:
+    def __init__(self, lines=24, cols=80):
+        self.cells = 0
+        self.updates = 0
+        self.stdscr = HeadlessWindow(self, lines, cols)
+
+    def newwin(self, lines, cols, y, x):
+        return HeadlessWindow(self, lines, cols)
+
+    def newpad(self, lines, cols):
+        return HeadlessWindow(self, lines, cols)
+
+    @staticmethod
+    def color_pair(n):
+        return n << 8
+
+    def doupdate(self):
+        self.updates += 1
+
 class KeyReader:
     def __init__(self, stdscr):
         self.__loop = asyncio.get_event_loop()
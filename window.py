@@ -24,17 +24,45 @@
     OTHER DEALINGS IN THE SOFTWARE.
 """
 import curses
+from bisect import bisect_left
 from textwrap import wrap
 from datetime import datetime
 import ui
+import stats
+import timer
+import filters
+import localecho
+
+SERVER = 0
+GROUP = 1
+PRIVATE = 2
+
+class Buffer:
+    __slots__ = ["kind", "name", "messages", "timestamps", "rewrites", "unread"]
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.messages = []
+        self.timestamps = []
+        self.rewrites = []
+        self.unread = 0
+
+def prewrap(messages, width):
+    return [Window.__convert_message__(width - Window.__prefix_length__(message_type, fields), message_type, fields)
+            for message_type, fields in messages]
 
 class ViewModel:
-    def __init__(self):
+    def __init__(self, rules=None):
         self.__title = (False, "")
         self.__time = (False, "")
+        self.__rtt = (False, "")
         self.__text = (False, "")
-        self.__messages = []
+        self.__activity = (False, ())
+        self.__buffers = [Buffer(SERVER, "server")]
+        self.__active = self.__buffers[0]
         self.__message_count = 0
+        self.__rules = rules
 
     @property
     def title(self):
@@ -62,6 +90,19 @@ class ViewModel:
     def time_changed(self):
         return self.__time[0]
 
+    @property
+    def rtt(self):
+        return self.__rtt[1]
+
+    @rtt.setter
+    def rtt(self, value):
+        if value != self.__rtt[1]:
+            self.__rtt = (True, value)
+
+    @property
+    def rtt_changed(self):
+        return self.__rtt[0]
+
     @property
     def text(self):
         return self.__text[1]
@@ -75,31 +116,139 @@ class ViewModel:
     def text_changed(self):
         return self.__text[0]
 
+    @property
+    def activity(self):
+        return self.__activity[1]
+
+    @property
+    def activity_changed(self):
+        return self.__activity[0]
+
+    @property
+    def buffers(self):
+        return self.__buffers
+
+    @property
+    def active(self):
+        return self.__active
+
+    def buffer(self, kind, name):
+        for b in self.__buffers:
+            if b.kind == kind and b.name == name:
+                return b
+
+        b = Buffer(kind, name)
+
+        self.__buffers.append(b)
+
+        return b
+
+    def switch(self, offset):
+        index = self.__buffers.index(self.__active)
+
+        self.select(self.__buffers[(index + offset) % len(self.__buffers)])
+
+    def select(self, buffer):
+        self.__active = buffer
+        self.__active.unread = 0
+        self.__message_count = -1
+
+        self.__update_activity__()
+
+    def __update_activity__(self):
+        activity = tuple(b.name for b in self.__buffers if b.unread)
+
+        if activity != self.__activity[1]:
+            self.__activity = (True, activity)
+
     @property
     def messages(self):
-        return self.__messages
+        return self.__active.messages
+
+    def find(self, timestamp):
+        return bisect_left(self.__active.timestamps, timestamp)
+
+    def append_message(self, timestamp, message_type, fields, buffer=None, flags=0):
+        rule_flags = self.__rules.apply(message_type, fields) if self.__rules else 0
+
+        if rule_flags is not None:
+            if buffer is None:
+                buffer = self.__active
+
+            buffer.messages.append((timestamp, message_type, fields, rule_flags | flags))
+            buffer.timestamps.append(timestamp)
+
+            if buffer is not self.__active:
+                buffer.unread += 1
+
+                self.__update_activity__()
+
+        return rule_flags is not None
+
+    def set_fields(self, buffer, index, fields):
+        timestamp, message_type, _, flags = buffer.messages[index]
+
+        buffer.messages[index] = (timestamp, message_type, fields, flags)
+
+        if not index in buffer.rewrites:
+            buffer.rewrites.append(index)
+
+    def set_flags(self, buffer, index, flags):
+        timestamp, message_type, fields, _ = buffer.messages[index]
+
+        buffer.messages[index] = (timestamp, message_type, fields, flags)
+        buffer.rewrites.append(index)
+
+    def take_rewrites(self):
+        rewrites = self.__active.rewrites
+
+        self.__active.rewrites = []
 
-    def append_message(self, timestamp, message_type, fields):
-        self.__messages.append((timestamp, message_type, fields))
+        return rewrites
 
     @property
     def messages_changed(self):
-        return self.__message_count != len(self.__messages)
+        return self.__message_count != len(self.__active.messages) or bool(self.__active.rewrites)
 
     @property
     def changed(self):
-        return self.title_changed or self.time_changed or self.text_changed or self.messages_changed
+        return self.title_changed or self.time_changed or self.rtt_changed or self.activity_changed or self.text_changed or self.messages_changed
 
     def sync(self):
         self.__title = (False, self.__title[1])
         self.__time = (False, self.__time[1])
+        self.__rtt = (False, self.__rtt[1])
         self.__text = (False, self.__text[1])
-        self.__message_count = len(self.__messages)
+        self.__activity = (False, self.__activity[1])
+        self.__message_count = len(self.__active.messages)
 
 class Window:
-    def __init__(self, stdscr, model: ViewModel):
+    Frames = stats.registry.counter("handgurke_frames_total", "Number of rendered frames.")
+    FramesSkipped = stats.registry.counter("handgurke_frames_skipped_total", "Number of refreshes without changes.")
+    RenderTime = stats.registry.histogram("handgurke_render_seconds", "Time spent rendering a frame.")
+    ScrollbackMessages = stats.registry.gauge("handgurke_scrollback_messages", "Number of stored messages.")
+    ScrollbackLines = stats.registry.gauge("handgurke_scrollback_lines", "Number of lines in the message pad.")
+    FrameCells = stats.registry.histogram("handgurke_frame_cells", "Number of characters written per frame.",
+                                          (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000))
+    Updates = stats.registry.counter("handgurke_screen_updates_total", "Number of physical screen updates.")
+
+    PrewrapThreshold = 500
+
+    def __init__(self, stdscr, model: ViewModel, completer=None, backend=curses, pool=None, notify=None):
         self.__model = model
         self.__stdscr = stdscr
+        self.__curses = backend
+        self.__pool = pool
+        self.__notify = notify
+        self.__wrapped = {}
+        self.__prewrapping = None
+        self.__buffer = None
+        self.__views = {}
+        self.__lines_dirty = False
+        self.__staged = False
+        self.__cells = 0
+        self.__completer = completer
+        self.__completion = None
         self.__draw_screen = True
         self.__text_pos = 0
         self.__text_offset = 0
@@ -111,6 +260,10 @@ class Window:
     def model(self):
         return self.__model
 
+    @property
+    def display_lines(self):
+        return self.__display_lines
+
     def send_key(self, ch):
         if isinstance(ch, int):
             if ch == curses.KEY_RESIZE:
@@ -128,9 +281,13 @@ class Window:
             elif ch == curses.KEY_END:
                 self.__move_end__()
             elif ch == curses.KEY_PPAGE:
-                self.__scroll_up__()
+                self.__scroll__(self.__y - 3)
             elif ch == curses.KEY_NPAGE:
-                self.__scroll_down__()
+                self.__scroll__(-(self.__y - 3))
+            elif ch == curses.KEY_SHOME:
+                self.__scroll__(self.__display_lines)
+            elif ch == curses.KEY_SEND:
+                self.__scroll__(-self.__display_lines)
         else:
             if ch == "\u007f":
                 self.__backspace__()
@@ -145,6 +302,12 @@ class Window:
                     self.__move_end__()
                 elif key_name == "^W":
                     self.__delete_word__()
+                elif key_name == "^I":
+                    self.__complete__()
+                elif key_name == "^N":
+                    self.__model.switch(1)
+                elif key_name == "^P":
+                    self.__model.switch(-1)
 
     def __backspace__(self):
         index = self.__text_offset + self.__text_pos
@@ -212,8 +375,7 @@ class Window:
     def __move_left__(self):
         if self.__text_pos > 0:
             self.__text_pos -= 1
-            self.__bottom.move(0, self.__text_pos)
-            self.__bottom.refresh()
+            self.__move_cursor__()
         elif self.__text_offset > 0:
             self.__text_offset -= 1
             self.__refresh_bottom__(force=True)
@@ -222,8 +384,7 @@ class Window:
         if self.__text_pos + self.__text_offset < len(self.__model.text):
             if self.__text_pos < self.__x - 1:
                 self.__text_pos += 1
-                self.__bottom.move(0, self.__text_pos)
-                self.__bottom.refresh()
+                self.__move_cursor__()
             else:
                 self.__text_offset += 1
                 self.__refresh_bottom__(force=True)
@@ -246,19 +407,62 @@ class Window:
         self.__bottom.move(0, self.__text_pos)
         self.__refresh_bottom__(force=True)
 
-    def __scroll_up__(self):
-        if self.__scroll_to < self.__display_lines - (self.__y - 2):
-            self.__scroll_to += 1
+    def __set_cursor__(self, index):
+        if index < self.__x:
+            self.__text_pos = index
+            self.__text_offset = 0
+        else:
+            self.__text_offset = index - self.__x + 1
+            self.__text_pos = self.__x - 1
 
-            self.__refresh_lines__(force=True)
-            self.__refresh_bottom__(force=True)
+        self.__refresh_bottom__(force=True)
 
-    def __scroll_down__(self):
-        if self.__scroll_to > 0:
-            self.__scroll_to -= 1
+    def __complete__(self):
+        if not self.__completer:
+            return
 
-            self.__refresh_lines__(force=True)
-            self.__refresh_bottom__(force=True)
+        text = self.__model.text
+
+        if self.__completion and self.__completion[0] == text:
+            _, start, end, candidates, index = self.__completion
+
+            index = (index + 1) % len(candidates)
+        else:
+            start, candidates = self.__completer.complete(text, self.__text_offset + self.__text_pos)
+            end = self.__text_offset + self.__text_pos
+            index = 0
+
+        if candidates:
+            completed = "%s " % candidates[index]
+
+            self.__model.text = "%s%s%s" % (text[:start], completed, text[end:])
+            self.__completion = (self.__model.text, start, start + len(completed), candidates, index)
+
+            self.__set_cursor__(start + len(completed))
+
+    def __scroll__(self, lines):
+        self.__set_scroll__(self.__scroll_to + lines)
+
+    def __set_scroll__(self, scroll_to):
+        scroll_to = min(max(scroll_to, 0), max(self.__display_lines - (self.__y - 2), 0))
+
+        if scroll_to != self.__scroll_to:
+            self.__scroll_to = scroll_to
+            self.__lines_dirty = True
+
+    def jump(self, timestamp):
+        jumped = False
+
+        if not self.__draw_screen and not self.__prewrapping:
+            index = self.__model.find(timestamp)
+
+            if index < len(self.__line_index):
+                # show the message in the first row
+                self.__set_scroll__(self.__display_lines - (self.__y - 2) - self.__line_index[index])
+
+                jumped = True
+
+        return jumped
 
     def clear(self):
         self.__stdscr.clear()
@@ -268,26 +472,60 @@ class Window:
         try:
             force = self.__draw_screen
 
-            if self.__create_screen__():
-                refreshed = self.__refresh_top__(force)
-                
-                if self.__refresh_lines__(force):
-                    refreshed = True
+            if not force and not self.__model.changed and not self.__lines_dirty:
+                self.FramesSkipped.inc()
+            elif self.__create_screen__():
+                t = timer.Timer()
+
+                switched = self.__buffer is not self.__model.active
 
-                self.__refresh_bottom__(force or refreshed)
+                if switched:
+                    self.__switch_buffer__()
+
+                self.__refresh_top__(force)
+                self.__refresh_lines__(force or switched)
+                self.__refresh_bottom__(force)
 
                 self.__model.sync()
+
+                self.Frames.inc()
+                self.FrameCells.observe(self.__cells)
+                self.RenderTime.observe(t.elapsed())
             else:
+                self.__staged = False
+
                 self.clear()
+
+            self.__update__()
         except:
             self.__draw_screen = True
 
+    def __update__(self):
+        if self.__staged:
+            # the cursor is left where the last staged window put it
+            self.__bottom.move(0, self.__text_pos)
+            self.__bottom.noutrefresh()
+
+            self.__curses.doupdate()
+
+            self.Updates.inc()
+
+            self.__staged = False
+
+        self.__cells = 0
+
+    def __move_cursor__(self):
+        self.__bottom.move(0, self.__text_pos)
+        self.__bottom.noutrefresh()
+
+        self.__staged = True
+
     def __create_screen__(self):
         drawn = True
 
         if self.__draw_screen:
             self.__stdscr.clear()
-            self.__stdscr.refresh()
+            self.__stdscr.noutrefresh()
 
             y, x = self.__stdscr.getmaxyx()
 
@@ -295,18 +533,16 @@ class Window:
             self.__x = x
 
             if self.__x >= 20 and self.__y >= 10:
-                self.__top = curses.newwin(1, self.__x, 0, 0)
-                self.__top.bkgd(' ', curses.color_pair(ui.COLORS_TITLE_BAR))
+                self.__top = self.__curses.newwin(1, self.__x, 0, 0)
+                self.__top.bkgd(' ', self.__curses.color_pair(ui.COLORS_TITLE_BAR))
 
-                self.__lines = curses.newpad(20, self.__x)
-                self.__lines.bkgd(' ', curses.color_pair(ui.COLORS_MESSAGE))
+                self.__views = {}
+                self.__buffer = self.__model.active
 
-                self.__display_lines = 0
-                self.__next_line = 0
-                self.__scroll_to = 0
+                self.__new_view__()
 
-                self.__bottom = curses.newwin(1, self.__x, self.__y - 1, 0)
-                self.__bottom.bkgd(' ', curses.color_pair(ui.COLORS_INPUT))
+                self.__bottom = self.__curses.newwin(1, self.__x, self.__y - 1, 0)
+                self.__bottom.bkgd(' ', self.__curses.color_pair(ui.COLORS_INPUT))
 
                 self.__draw_screen = False
             else:
@@ -314,115 +550,258 @@ class Window:
 
         return drawn
 
+    def __new_view__(self):
+        self.__lines = self.__curses.newpad(max(20, self.__y), self.__x)
+        self.__lines.bkgd(' ', self.__curses.color_pair(ui.COLORS_MESSAGE))
+
+        self.__display_lines = 0
+        self.__next_line = 0
+        self.__scroll_to = 0
+        self.__line_index = []
+
+        self.__wrapped = {}
+
+        if self.__pool and len(self.__model.messages) > self.PrewrapThreshold:
+            self.__prewrap__()
+
+    def __switch_buffer__(self):
+        if self.__prewrapping:
+            self.__prewrapping.cancel()
+            self.__prewrapping = None
+        else:
+            self.__views[self.__buffer] = (self.__lines, self.__display_lines, self.__next_line, self.__scroll_to, self.__line_index, self.__wrapped)
+
+        self.__buffer = self.__model.active
+
+        view = self.__views.pop(self.__buffer, None)
+
+        if view:
+            self.__lines, self.__display_lines, self.__next_line, self.__scroll_to, self.__line_index, self.__wrapped = view
+        else:
+            self.__new_view__()
+
     def __refresh_top__(self, force):
         refreshed = False
 
-        if self.__model.title_changed or self.__model.time_changed or force:
+        if self.__model.title_changed or self.__model.time_changed or self.__model.rtt_changed or self.__model.activity_changed or force:
             refreshed = True
 
-            self.__top.clear()
-
             title = self.__model.title
+            status = "%5s" % self.__model.time
+
+            if self.__model.rtt:
+                status = "%s %s" % (self.__model.rtt, status)
+
+            if self.__model.activity:
+                activity = ",".join(self.__model.activity)
+
+                if len(activity) > self.__x // 3:
+                    activity = "%s..." % activity[:self.__x // 3 - 3]
 
-            if len(title) > self.__x - 16:
-                title = "%s..." % title[:self.__x - 10]
+                status = "[%s] %s" % (activity, status)
 
-            fmt = "%-" + str(self.__x - 6) + "s%5s"
+            width = self.__x - len(status) - 1
 
-            title = fmt % (title, self.__model.time)
+            if len(title) > width - 10:
+                title = "%s..." % title[:width - 4]
+
+            fmt = "%-" + str(width) + "s%s"
+
+            title = fmt % (title, status)
 
             self.__top.addstr(0, 0, title)
-            self.__top.refresh()
+            self.__top.noutrefresh()
+
+            self.__cells += len(title)
+            self.__staged = True
 
         return refreshed
 
+    def __prewrap__(self):
+        width = self.__x
+        messages = [(message_type, fields) for _, message_type, fields, _ in self.__model.messages]
+
+        if self.__prewrapping:
+            self.__prewrapping.cancel()
+
+        self.__prewrapping = self.__pool.submit(prewrap, messages, width)
+        self.__prewrapping.add_done_callback(lambda f: self.__prewrapped__(f, width))
+
+    def __prewrapped__(self, f, width):
+        if f is self.__prewrapping:
+            self.__prewrapping = None
+
+            if width == self.__x and f.exception() is None:
+                self.__wrapped = dict(enumerate(f.result()))
+
+            self.__lines_dirty = True
+
+            if self.__notify:
+                self.__notify()
+
     def __refresh_lines__(self, force):
         refreshed = False
 
-        if self.__model.messages_changed or force:
+        if self.__prewrapping:
+            return refreshed
+
+        if self.__model.messages_changed or self.__lines_dirty or force:
             refreshed = True
+            self.__lines_dirty = False
 
             max_y, max_x = self.__lines.getmaxyx()
 
             old_lines = self.__display_lines
 
-            for timestamp, message_type, fields in self.__model.messages[self.__next_line:]:
-                if self.__display_lines >= max_y:
+            for index in sorted(set(self.__model.take_rewrites())):
+                if index < self.__next_line:
+                    self.__rewrite__(index)
+                else:
+                    self.__wrapped.pop(index, None)
+
+            for timestamp, message_type, fields, flags in self.__model.messages[self.__next_line:]:
+                if self.__display_lines + 1 >= max_y:
                     max_y *= 2
                     self.__lines.resize(max_y, max_x)
 
+                self.__line_index.append(self.__display_lines)
+
                 padding = self.__write_prefix__(self.__display_lines, timestamp, message_type, fields)
+                self.__cells += padding
                 first_line = True
 
-                colors = ui.COLORS_MESSAGE
+                colors = self.__message_colors__(message_type, flags)
+
+                lines = self.__wrapped.pop(self.__next_line, None)
 
-                if message_type == "i":
-                    colors = ui.COLORS_OUTPUT
+                if lines is None:
+                    lines = self.__convert_message__(self.__x - padding, message_type, fields)
 
-                for l in self.__convert_message__(self.__x - padding, message_type, fields):
-                    if self.__display_lines >= max_y:
+                for l in lines:
+                    if self.__display_lines + 1 >= max_y:
                         max_y *= 2
                         self.__lines.resize(max_y, max_x)
 
                     if first_line: 
-                        self.__lines.addstr(l, curses.color_pair(colors))
+                        self.__lines.addstr(l, colors)
                         first_line = False
                     else:
                         self.__lines.addstr(self.__display_lines, 0, " " * padding, ui.COLORS_MESSAGE)
-                        self.__lines.addstr(l, curses.color_pair(colors))
+                        self.__lines.addstr(l, colors)
 
+                    self.__cells += len(l)
                     self.__display_lines += 1
 
                 self.__next_line += 1
 
+            self.ScrollbackMessages.set(len(self.__model.messages))
+            self.ScrollbackLines.set(self.__display_lines)
+
             if self.__scroll_to == 0:
                 scroll_to = self.__display_lines - self.__y + 2
-
-                self.__lines.refresh(scroll_to, 0, 1, 0, self.__y - 2, self.__x)
             else:
                 self.__scroll_to += self.__display_lines - old_lines
                 scroll_to = self.__display_lines - self.__y + 2 - self.__scroll_to
 
-                self.__lines.refresh(scroll_to, 0, 1, 0, self.__y - 2, self.__x)
+            self.__lines.noutrefresh(scroll_to, 0, 1, 0, self.__y - 2, self.__x)
+
+            self.__staged = True
 
         return refreshed
 
-    def __write_prefix__(self, row, timestamp, message_type, fields):
+    def __message_colors__(self, message_type, flags):
+        colors = self.__curses.color_pair(ui.COLORS_MESSAGE)
+
+        if flags & localecho.FAILED:
+            colors = self.__curses.color_pair(ui.COLORS_ERROR)
+        elif flags & filters.HIGHLIGHT:
+            colors = self.__curses.color_pair(ui.COLORS_HIGHLIGHT) | curses.A_BOLD
+        elif message_type == "i":
+            colors = self.__curses.color_pair(ui.COLORS_OUTPUT)
+
+        if flags & localecho.PENDING:
+            colors |= curses.A_DIM
+
+        return colors
+
+    def __rewrite__(self, index):
+        timestamp, message_type, fields, flags = self.__model.messages[index]
+        row = self.__line_index[index]
+        rows = (self.__line_index[index + 1] if index + 1 < self.__next_line else self.__display_lines) - row
+        padding = self.__prefix_length__(message_type, fields)
+        lines = self.__convert_message__(self.__x - padding, message_type, fields)
+
+        if len(lines) != rows:
+            # the following messages move, they are drawn again from this one on
+            self.__lines.move(row, 0)
+            self.__lines.clrtobot()
+
+            self.__display_lines = row
+            self.__next_line = index
+
+            del self.__line_index[index:]
+
+            return
+
+        for i in range(row, row + rows):
+            self.__lines.move(i, 0)
+            self.__lines.clrtoeol()
+
+        self.__write_prefix__(row, timestamp, message_type, fields)
+        colors = self.__message_colors__(message_type, flags)
+
+        for i, l in enumerate(lines):
+            if i:
+                self.__lines.addstr(row + i, padding, l, colors)
+            else:
+                self.__lines.addstr(l, colors)
+
+            self.__cells += len(l)
+
+        self.__cells += padding
+
+    @staticmethod
+    def __prefix_length__(message_type, fields):
         length = 9
 
+        if message_type in "bcdf":
+            length += len(fields[0]) + 3
+        elif message_type == "e":
+            length += 6
+        elif message_type == "k":
+            length += 7
+
+        return length
+
+    def __write_prefix__(self, row, timestamp, message_type, fields):
         time = timestamp.strftime("%H:%M:%S")
 
-        self.__lines.addstr(row, 0, time, curses.color_pair(ui.COLORS_TIMESTAMP))
-        self.__lines.addstr(" ", curses.color_pair(ui.COLORS_MESSAGE))
+        self.__lines.addstr(row, 0, time, self.__curses.color_pair(ui.COLORS_TIMESTAMP))
+        self.__lines.addstr(" ", self.__curses.color_pair(ui.COLORS_MESSAGE))
 
         if message_type == "b":
-            length += len(fields[0]) + 3
-            self.__lines.addstr("<%s>" % fields[0], curses.color_pair(ui.COLORS_NICK))
-            self.__lines.addstr(" ", curses.color_pair(ui.COLORS_MESSAGE))
+            self.__lines.addstr("<%s>" % fields[0], self.__curses.color_pair(ui.COLORS_NICK))
+            self.__lines.addstr(" ", self.__curses.color_pair(ui.COLORS_MESSAGE))
         elif message_type == "c":
-            length += len(fields[0]) + 3
-            self.__lines.addstr("*%s*" % fields[0], curses.color_pair(ui.COLORS_PERSONAL) | curses.A_BOLD)
-            self.__lines.addstr(" ", curses.color_pair(ui.COLORS_MESSAGE))
+            self.__lines.addstr("*%s*" % fields[0], self.__curses.color_pair(ui.COLORS_PERSONAL) | curses.A_BOLD)
+            self.__lines.addstr(" ", self.__curses.color_pair(ui.COLORS_MESSAGE))
         elif message_type == "d":
-            length += len(fields[0]) + 3
-            self.__lines.addstr("[%s]" % fields[0], curses.color_pair(ui.COLORS_STATUS))
-            self.__lines.addstr(" ", curses.color_pair(ui.COLORS_MESSAGE))
+            self.__lines.addstr("[%s]" % fields[0], self.__curses.color_pair(ui.COLORS_STATUS))
+            self.__lines.addstr(" ", self.__curses.color_pair(ui.COLORS_MESSAGE))
         elif message_type == "e":
-            length += 6
-            self.__lines.addstr("*ERR*", curses.color_pair(ui.COLORS_ERROR))
-            self.__lines.addstr(" ", curses.color_pair(ui.COLORS_MESSAGE))
+            self.__lines.addstr("*ERR*", self.__curses.color_pair(ui.COLORS_ERROR))
+            self.__lines.addstr(" ", self.__curses.color_pair(ui.COLORS_MESSAGE))
         elif message_type == "f":
-            length += len(fields[0]) + 3
-            self.__lines.addstr("[%s]" % fields[0], curses.color_pair(ui.COLORS_IMPORTANT))
-            self.__lines.addstr(" ", curses.color_pair(ui.COLORS_MESSAGE))
+            self.__lines.addstr("[%s]" % fields[0], self.__curses.color_pair(ui.COLORS_IMPORTANT))
+            self.__lines.addstr(" ", self.__curses.color_pair(ui.COLORS_MESSAGE))
         elif message_type == "k":
-            length += 7
-            self.__lines.addstr("*BEEP*", curses.color_pair(ui.COLORS_PERSONAL) | curses.A_BOLD)
-            self.__lines.addstr(" ", curses.color_pair(ui.COLORS_MESSAGE))
+            self.__lines.addstr("*BEEP*", self.__curses.color_pair(ui.COLORS_PERSONAL) | curses.A_BOLD)
+            self.__lines.addstr(" ", self.__curses.color_pair(ui.COLORS_MESSAGE))
 
-        return length
+        return self.__prefix_length__(message_type, fields)
 
-    def __convert_message__(self, max_length, message_type, fields):
+    @staticmethod
+    def __convert_message__(max_length, message_type, fields):
         lines = []
 
         if message_type in "bcdf":
@@ -442,7 +821,7 @@ class Window:
 
                 l = " %1s %-16s %4s %-8s %s@%s%s" % ("*" if fields[1] else "",
                                                      fields[2],
-                                                     self.__idle_str__(int(fields[3])),
+                                                     Window.__idle_str__(int(fields[3])),
                                                      datetime.fromtimestamp(int(fields[5])).strftime("%X"),
                                                      fields[6],
                                                      fields[7],
@@ -499,6 +878,6 @@ class Window:
 
             self.__bottom.addstr(0, 0, text)
 
-            self.__bottom.move(0, self.__text_pos)
+            self.__cells += len(text)
 
-            self.__bottom.refresh()
+            self.__move_cursor__()
@@ -0,0 +1,65 @@
+"""
+    project............: Handgurke
+    description........: ICB client
+    date...............: 06/2019
+    copyright..........: Sebastian Fedrau
+
+    Permission is hereby granted, free of charge, to any person obtaining
+    a copy of this software and associated documentation files (the
+    "Software"), to deal in the Software without restriction, including
+    without limitation the rights to use, copy, modify, merge, publish,
+    distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to
+    the following conditions:
+
+    The above copyright notice and this permission notice shall be
+    included in all copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+    EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+    MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+    IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+    OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+    ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+    OTHER DEALINGS IN THE SOFTWARE.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import stats
+
+class Pool:
+    IsolatedWorkers = 4
+
+    Jobs = stats.registry.counter("handgurke_worker_jobs_total", "Number of jobs submitted to the worker pool.", "queue")
+
+    def __init__(self, workers=2, processes=False, loop=None):
+        self.__loop = loop if loop else asyncio.get_event_loop()
+
+        if processes:
+            self.__executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self.__executor = ThreadPoolExecutor(max_workers=workers)
+
+        self.__serial = ThreadPoolExecutor(max_workers=1)
+        # separate threads, so slow jobs cannot hold up the pool
+        self.__isolated = ThreadPoolExecutor(max_workers=self.IsolatedWorkers)
+
+    def submit(self, fn, *args):
+        self.Jobs.inc(1, "pool")
+
+        return self.__loop.run_in_executor(self.__executor, fn, *args)
+
+    def submit_serial(self, fn, *args):
+        self.Jobs.inc(1, "serial")
+
+        return self.__loop.run_in_executor(self.__serial, fn, *args)
+
+    def submit_isolated(self, fn, *args):
+        self.Jobs.inc(1, "isolated")
+
+        return self.__loop.run_in_executor(self.__isolated, fn, *args)
+
+    def shutdown(self):
+        self.__executor.shutdown(wait=False)
+        self.__isolated.shutdown(wait=False)
+        self.__serial.shutdown(wait=True)